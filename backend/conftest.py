@@ -0,0 +1,60 @@
+"""
+Shared pytest setup for the backend tests
+Run from the backend folder: python -m pytest -q
+"""
+
+import contextlib
+import io
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+# Manual script that drives a running backend on localhost:5557, not a pytest module
+collect_ignore = ["test_file_tools.py"]
+
+
+@pytest.fixture(scope="session")
+def server():
+    """Import the Flask app module once, keeping its startup banner out of the test output"""
+    with contextlib.redirect_stdout(io.StringIO()):
+        import server as server_module
+    return server_module
+
+
+class FakeSentenceTransformer:
+    """Deterministic bag-of-words embedder standing in for sentence_transformers"""
+
+    dimension = 32
+    instances = 0
+
+    def __init__(self, model_name):
+        FakeSentenceTransformer.instances += 1
+        self.encoded = 0
+
+    def get_sentence_embedding_dimension(self):
+        return self.dimension
+
+    def encode(self, texts, batch_size=32, normalize_embeddings=False, convert_to_numpy=True):
+        import numpy as np
+        self.encoded += len(texts)
+        vectors = np.zeros((len(texts), self.dimension), dtype='float32')
+        for row, text in enumerate(texts):
+            for word in text.lower().split():
+                vectors[row, sum(map(ord, word)) % self.dimension] += 1
+        if normalize_embeddings:
+            norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+            vectors /= np.where(norms == 0, 1, norms)
+        return vectors
+
+
+@pytest.fixture
+def fake_sentence_transformers(monkeypatch):
+    """Install FakeSentenceTransformer as the sentence_transformers module"""
+    module = type(sys)("sentence_transformers")
+    module.SentenceTransformer = FakeSentenceTransformer
+    FakeSentenceTransformer.instances = 0
+    monkeypatch.setitem(sys.modules, "sentence_transformers", module)
+    return FakeSentenceTransformer
@@ -5,13 +5,35 @@ Handles Ollama model discovery, management, and selection
 """
 
 import os
+import re
 import json
 import requests
+from requests.adapters import HTTPAdapter
 import time
 from datetime import datetime
 from typing import Dict, List, Any, Optional
 from dataclasses import dataclass
 
+# Keywords that suggest a question is about the user's files. They are matched as
+# substrings, so each list is compiled once into a single alternation and the prompt
+# is scanned in one pass instead of once per keyword.
+FILE_KEYWORDS = [
+    # Direct file operations
+    'latest', 'last', 'file', 'note', 'document', 'search', 'find', 'grep', 'list', 'show', 'get',
+    # Time-based queries
+    'when was', 'added', 'modified', 'timestamp', 'recent', 'newest', 'oldest',
+    # Content-based queries
+    'contain', 'mention', 'include', 'about', 'content', 'text', 'data',
+    # Possessive/ownership indicators
+    'my', 'your', 'have', 'got', 'exists', 'any',
+    # Question patterns that often indicate file queries
+    'what', 'when', 'where', 'which', 'how many'
+]
+DATE_PATTERNS = ["8/", "9/", "10/", "11/", "12/", "1/", "2/", "3/", "4/", "5/", "6/", "7/", "2025", "2024", "2023"]
+
+_FILE_KEYWORD_RE = re.compile('|'.join(map(re.escape, FILE_KEYWORDS)))
+_DATE_PATTERN_RE = re.compile('|'.join(map(re.escape, DATE_PATTERNS)))
+
 @dataclass
 class ModelInfo:
     """Information about an Ollama model"""
@@ -31,30 +53,41 @@ class ModelManager:
         self.running_models = set()
         self.model_cache = {}
         self.cache_ttl = 30  # 30 seconds cache for model info
+        self.status_ttl = 1  # Dashboards poll status and running models, 1 second cache collapses the polls
+        self.keep_alive = None  # How long the pinned model stays loaded (e.g. "24h"), set by the server
+        self.pinned_model = None  # Only this model is kept loaded past Ollama's default, so fallbacks don't hog memory
+        # Keep-alive connections to Ollama are reused across calls instead of reconnecting each time
+        self.session = requests.Session()
+        self.session.mount('http://', HTTPAdapter(pool_connections=4, pool_maxsize=16))
+        self.session.mount('https://', HTTPAdapter(pool_connections=4, pool_maxsize=16))
         
     def check_ollama_status(self) -> bool:
         """Check if Ollama is running and accessible"""
+        cached = self.model_cache.get("ollama_status")
+        if cached and time.time() - cached[1] < self.status_ttl:
+            return cached[0]
+        
         try:
-            response = requests.get(f"{self.ollama_url}/api/tags", timeout=5)
-            return response.status_code == 200
+            response = self.session.get(f"{self.ollama_url}/api/tags", timeout=5)
+            status = response.status_code == 200
         except Exception as e:
             print(f"❌ Ollama not accessible: {e}")
-            return False
+            status = False
+        self.model_cache["ollama_status"] = (status, time.time())
+        return status
     
     def get_available_models(self) -> List[ModelInfo]:
         """Get list of available Ollama models with detailed information"""
-        if not self.check_ollama_status():
-            return []
-        
-        # Check cache first
+        # Check cache first, before any round-trip to Ollama
         cache_key = "available_models"
         if cache_key in self.model_cache:
             cached_data, timestamp = self.model_cache[cache_key]
             if time.time() - timestamp < self.cache_ttl:
                 return cached_data
         
+        # Listing the models doubles as the status check, an unreachable Ollama lands in the except below
         try:
-            response = requests.get(f"{self.ollama_url}/api/tags", timeout=10)
+            response = self.session.get(f"{self.ollama_url}/api/tags", timeout=10)
             if response.status_code == 200:
                 data = response.json()
                 models = []
@@ -82,17 +115,22 @@ class ModelManager:
             print(f"❌ Error getting models: {e}")
             return []
     
-    def get_running_models(self) -> List[str]:
+    def get_running_models(self, use_cache: bool = True) -> List[str]:
         """Get list of currently running models"""
+        cached = self.model_cache.get("running_models")
+        if use_cache and cached and time.time() - cached[1] < self.status_ttl:
+            return list(cached[0])
+        
         try:
-            response = requests.get(f"{self.ollama_url}/api/ps", timeout=5)
+            response = self.session.get(f"{self.ollama_url}/api/ps", timeout=5)
             if response.status_code == 200:
                 data = response.json()
                 running = []
                 for model in data.get('models', []):
                     running.append(model.get('name', ''))
                 self.running_models = set(running)
-                return running
+                self.model_cache["running_models"] = (running, time.time())
+                return list(running)
             return []
         except Exception as e:
             print(f"❌ Error getting running models: {e}")
@@ -159,18 +197,31 @@ class ModelManager:
             return "Custom trained model"
         return "Language model"
     
-    def start_model(self, model_name: str) -> bool:
-        """Start/load a model into memory"""
+    def keep_alive_for(self, model_name: str) -> Optional[str]:
+        """keep_alive to send for a model: the pin for the pinned model, None (Ollama's default) otherwise"""
+        if not self.pinned_model or not model_name:
+            return None
+        # Ollama lists "llama2:latest" for a model requested as "llama2"
+        same_model = model_name.replace(':latest', '') == self.pinned_model.replace(':latest', '')
+        return self.keep_alive if same_model else None
+    
+    def start_model(self, model_name: str, keep_alive: Optional[str] = None) -> bool:
+        """Start/load a model into memory, optionally pinning it for keep_alive (e.g. "24h")"""
+        if keep_alive is None:
+            keep_alive = self.keep_alive_for(model_name)
         try:
             # Send a simple request to load the model
-            response = requests.post(f"{self.ollama_url}/api/generate", json={
+            request_data = {
                 "model": model_name,
                 "prompt": "Hello",
                 "stream": False,
                 "options": {
                     "num_predict": 1  # Minimal response to just load the model
                 }
-            }, timeout=30)
+            }
+            if keep_alive is not None:
+                request_data["keep_alive"] = keep_alive
+            response = self.session.post(f"{self.ollama_url}/api/generate", json=request_data, timeout=30)
             
             if response.status_code == 200:
                 self.running_models.add(model_name)
@@ -194,7 +245,7 @@ class ModelManager:
             print(f"🔄 Requesting model {model_name} to unload...")
             
             # Send a request with keep_alive=0 to unload the model immediately
-            response = requests.post(f"{self.ollama_url}/api/generate", json={
+            response = self.session.post(f"{self.ollama_url}/api/generate", json={
                 "model": model_name,
                 "prompt": "",
                 "stream": False,
@@ -208,7 +259,7 @@ class ModelManager:
             time.sleep(0.5)
             
             # Verify the model is actually stopped by checking running models
-            running_models = self.get_running_models()
+            running_models = self.get_running_models(use_cache=False)
             if model_name not in running_models:
                 self.running_models.discard(model_name)
                 print(f"✅ Model {model_name} successfully unloaded")
@@ -219,7 +270,7 @@ class ModelManager:
                 # Alternative: Try to make the model unload by sending multiple quick requests
                 for i in range(3):
                     try:
-                        requests.post(f"{self.ollama_url}/api/generate", json={
+                        self.session.post(f"{self.ollama_url}/api/generate", json={
                             "model": model_name,
                             "prompt": "",
                             "stream": False,
@@ -231,7 +282,7 @@ class ModelManager:
                 
                 # Final check
                 time.sleep(0.5)
-                running_models = self.get_running_models()
+                running_models = self.get_running_models(use_cache=False)
                 if model_name not in running_models:
                     self.running_models.discard(model_name)
                     print(f"✅ Model {model_name} force unloaded successfully")
@@ -244,7 +295,7 @@ class ModelManager:
             print(f"❌ Error unloading model {model_name}: {e}")
             # Still try to check if it's actually stopped
             try:
-                running_models = self.get_running_models()
+                running_models = self.get_running_models(use_cache=False)
                 if model_name not in running_models:
                     self.running_models.discard(model_name)
                     return True
@@ -303,7 +354,7 @@ class ModelManager:
         """Pull/download a new model"""
         try:
             print(f"🔄 Pulling model: {model_name}")
-            response = requests.post(f"{self.ollama_url}/api/pull", json={
+            response = self.session.post(f"{self.ollama_url}/api/pull", json={
                 "name": model_name
             }, timeout=300)  # 5 minute timeout for downloads
             
@@ -324,7 +375,7 @@ class ModelManager:
         """Delete a model and associated training files if it's a trained model"""
         try:
             # First delete the model from Ollama
-            response = requests.delete(f"{self.ollama_url}/api/delete", json={
+            response = self.session.delete(f"{self.ollama_url}/api/delete", json={
                 "name": model_name
             })
             
@@ -358,9 +409,6 @@ class ModelManager:
     
     def _cleanup_training_files(self, model_name: str) -> List[str]:
         """Clean up training files associated with a trained model"""
-        import os
-        from pathlib import Path
-        
         deleted_files = []
         local_models_dir = "/app/local_models"
         
@@ -509,27 +557,10 @@ class ModelManager:
         
         try:
             # Check if the question is about file operations
-            file_keywords = [
-                # Direct file operations
-                'latest', 'last', 'file', 'note', 'document', 'search', 'find', 'grep', 'list', 'show', 'get',
-                # Time-based queries
-                'when was', 'added', 'modified', 'timestamp', 'recent', 'newest', 'oldest',
-                # Content-based queries
-                'contain', 'mention', 'include', 'about', 'content', 'text', 'data',
-                # Possessive/ownership indicators
-                'my', 'your', 'have', 'got', 'exists', 'any',
-                # Question patterns that often indicate file queries
-                'what', 'when', 'where', 'which', 'how many'
-            ]
-            date_patterns = ["8/", "9/", "10/", "11/", "12/", "1/", "2/", "3/", "4/", "5/", "6/", "7/", "2025", "2024", "2023"]
-            
-            # More intelligent detection - look for patterns that suggest file operations
-            is_file_question = (
-                any(keyword in prompt.lower() for keyword in file_keywords) or 
-                any(pattern in prompt for pattern in date_patterns) or
-                # Check for question patterns that often indicate file queries
-                (prompt.lower().startswith(('what', 'when', 'where', 'which', 'how')) and 
-                 any(word in prompt.lower() for word in ['file', 'note', 'document', 'content', 'have', 'got', 'latest', 'last']))
+            prompt_lower = prompt.lower()
+            is_file_question = bool(
+                _FILE_KEYWORD_RE.search(prompt_lower) or
+                _DATE_PATTERN_RE.search(prompt)
             )
             
             # Check if we have file context from MCP tools
@@ -541,7 +572,7 @@ class ModelManager:
                 try:
                     
                     # Check if it's about notes (Medscribe is the default directory for notes)
-                    if "note" in prompt.lower() or "medscribe" in prompt.lower() or "knowledge_base" in prompt.lower():
+                    if "note" in prompt_lower or "medscribe" in prompt_lower or "knowledge_base" in prompt_lower:
                         # Find the latest file
                         latest_response = requests.post("http://localhost:5557/tools/find-latest-file", 
                                                       json={"directory": "Medscribe", "pattern": "*.md"})
@@ -669,7 +700,7 @@ Please respond according to your personality and provide a helpful answer based
                 print(f"📄 MCP context preview: {context[:200]}...")
                 print(f"📄 FULL MCP context: {context}")
             
-            response = requests.post(f"{self.ollama_url}/api/generate", json={
+            request_data = {
                 "model": selected,
                 "prompt": full_prompt,
                 "stream": stream,
@@ -683,7 +714,13 @@ Please respond according to your personality and provide a helpful answer based
                     "num_thread": 4
                     # Removed restrictive stop sequences that were cutting off responses
                 }
-            }, timeout=120)  # Increased timeout to 120 seconds for complex queries
+            }
+            keep_alive = self.keep_alive_for(selected)
+            if keep_alive is not None:
+                # Without it every query to the pinned model resets it to Ollama's default unload timer
+                request_data["keep_alive"] = keep_alive
+            response = self.session.post(f"{self.ollama_url}/api/generate", json=request_data,
+                                         timeout=120)  # Increased timeout to 120 seconds for complex queries
             
             if response.status_code == 200:
                 if stream:
@@ -5,13 +5,57 @@ Trains the Ollama model on knowledge base documents and feedback data
 """
 
 import os
+import re
 import json
+import hashlib
 import requests
+from requests.adapters import HTTPAdapter
 import time
 from datetime import datetime
 from typing import Dict, List, Any, Optional
 from pathlib import Path
 
+# Fast non-cryptographic hashing for response cache keys when xxhash is installed
+try:
+    import xxhash
+    XXHASH_AVAILABLE = True
+except ImportError:
+    XXHASH_AVAILABLE = False
+
+# Fast JSON encoding for streamed events when orjson is installed
+try:
+    import orjson
+    ORJSON_AVAILABLE = True
+except ImportError:
+    ORJSON_AVAILABLE = False
+
+# Parses Ollama's JSON straight from the response bytes
+json_loads = orjson.loads if ORJSON_AVAILABLE else json.loads
+
+def sse_event(payload: Dict[str, Any]) -> bytes:
+    """Encode one server-sent event, escaping token text so every event is valid JSON"""
+    body = orjson.dumps(payload) if ORJSON_AVAILABLE else json.dumps(payload).encode('utf-8')
+    return b"data: " + body + b"\n\n"
+
+# Every stream ends with the same event, so it is encoded once
+SSE_DONE_EVENT = sse_event({"done": True})
+
+# Feedback phrases and the improvement each one asks for, in the order improvements are listed
+FEEDBACK_IMPROVEMENTS = [
+    (("more detail", "incomplete"), "Provide more comprehensive information"),
+    (("examples", "specific"), "Include specific examples"),
+    (("confusing", "unclear"), "Make the response clearer and better structured"),
+    (("too long", "verbose"), "Make the response more concise"),
+]
+_FEEDBACK_PHRASE_IMPROVEMENT = {
+    phrase: index for index, (phrases, _) in enumerate(FEEDBACK_IMPROVEMENTS) for phrase in phrases
+}
+# All phrases in one alternation so feedback text is scanned once instead of once per phrase
+_FEEDBACK_KEYWORD_RE = re.compile('|'.join(re.escape(phrase) for phrase in _FEEDBACK_PHRASE_IMPROVEMENT))
+FEEDBACK_SCAN_LIMIT = 4096  # Feedback phrases are short, so only the start of long pasted text is scanned
+
+DEFAULT_PERSONALITY_PROMPT = "You are a helpful AI assistant. Provide accurate, clear, and helpful responses."
+
 class OllamaTrainer:
     def __init__(self, ollama_url: str = "http://host.docker.internal:11434"):
         self.ollama_url = ollama_url
@@ -22,14 +66,22 @@ class OllamaTrainer:
         # Add caching for performance
         self.response_cache = {}
         self.cache_ttl = 3600  # 1 hour cache TTL
+        self.keep_alive = None  # How long the pinned model stays loaded (e.g. "24h"), set by the server
+        self.pinned_model = None  # Only this model is kept loaded past Ollama's default, so fallbacks don't hog memory
         self.last_cache_cleanup = time.time()
         self.cache_hits = 0
         self.cache_misses = 0
+        self.personality_provider = None  # Callable returning the current personality prompt, set by the server
+        self.token_batcher = None  # Factory for an object joining streamed tokens into fewer events, set by the server
+        # Keep-alive connections to Ollama are reused across calls instead of reconnecting each time
+        self.session = requests.Session()
+        self.session.mount('http://', HTTPAdapter(pool_connections=4, pool_maxsize=16))
+        self.session.mount('https://', HTTPAdapter(pool_connections=4, pool_maxsize=16))
         
     def check_ollama_status(self) -> bool:
         """Check if Ollama is running and accessible"""
         try:
-            response = requests.get(f"{self.ollama_url}/api/tags", timeout=5)
+            response = self.session.get(f"{self.ollama_url}/api/tags", timeout=5)
             return response.status_code == 200
         except Exception as e:
             print(f"❌ Ollama not accessible: {e}")
@@ -38,7 +90,7 @@ class OllamaTrainer:
     def get_available_models(self) -> List[str]:
         """Get list of available Ollama models"""
         try:
-            response = requests.get(f"{self.ollama_url}/api/tags")
+            response = self.session.get(f"{self.ollama_url}/api/tags")
             if response.status_code == 200:
                 models = response.json().get('models', [])
                 return [model['name'] for model in models]
@@ -47,15 +99,26 @@ class OllamaTrainer:
             print(f"❌ Error getting models: {e}")
             return []
     
+    def fetch_model_names(self) -> Optional[List[str]]:
+        """Fetch installed model names in one /api/tags call, or None if Ollama is not accessible"""
+        try:
+            response = self.session.get(f"{self.ollama_url}/api/tags", timeout=5)
+            if response.status_code == 200:
+                return [model['name'] for model in response.json().get('models', [])]
+        except Exception as e:
+            print(f"❌ Ollama not accessible: {e}")
+        return None
+    
     def has_trained_model(self) -> bool:
         """Check if a trained model exists"""
         available_models = self.get_available_models()
         trained_models = [model for model in available_models if model.endswith('-trained')]
         return len(trained_models) > 0
     
-    def get_best_available_model(self) -> str:
+    def get_best_available_model(self, available_models: Optional[List[str]] = None) -> str:
         """Get the best available model (trained first, then fallbacks)"""
-        available_models = self.get_available_models()
+        if available_models is None:
+            available_models = self.get_available_models()
         
         # Look for ollama-trained model first (with or without :latest suffix)
         for model in available_models:
@@ -215,19 +278,12 @@ class OllamaTrainer:
     
     def generate_improved_response(self, original_response: str, feedback_text: str) -> Optional[str]:
         """Generate an improved response based on feedback"""
-        improvements = []
-        
-        if 'more detail' in feedback_text or 'incomplete' in feedback_text:
-            improvements.append("Provide more comprehensive information")
-        
-        if 'examples' in feedback_text or 'specific' in feedback_text:
-            improvements.append("Include specific examples")
-        
-        if 'confusing' in feedback_text or 'unclear' in feedback_text:
-            improvements.append("Make the response clearer and better structured")
-        
-        if 'too long' in feedback_text or 'verbose' in feedback_text:
-            improvements.append("Make the response more concise")
+        matched = set()
+        for match in _FEEDBACK_KEYWORD_RE.finditer(feedback_text, 0, FEEDBACK_SCAN_LIMIT):
+            matched.add(_FEEDBACK_PHRASE_IMPROVEMENT[match.group()])
+            if len(matched) == len(FEEDBACK_IMPROVEMENTS):
+                break  # Every improvement already requested
+        improvements = [FEEDBACK_IMPROVEMENTS[index][1] for index in sorted(matched)]
         
         if improvements:
             return f"{original_response}\n\n[Improved based on feedback: {', '.join(improvements)}]"
@@ -366,7 +422,7 @@ PARAMETER stop "Assistant:"
             print(f"🔧 Creating fine-tuned model: {custom_model_name}")
             
             # Use requests to call Ollama create API with modelfile parameter
-            create_response = requests.post(f"{self.ollama_url}/api/create", json={
+            create_response = self.session.post(f"{self.ollama_url}/api/create", json={
                 "name": custom_model_name,
                 "modelfile": modelfile_content
             })
@@ -389,7 +445,7 @@ PARAMETER stop "Assistant:"
                 
                 # Fallback: try to create without training data (just base model)
                 print("🔄 Trying fallback: creating model with base model only")
-                fallback_response = requests.post(f"{self.ollama_url}/api/create", json={
+                fallback_response = self.session.post(f"{self.ollama_url}/api/create", json={
                     "name": custom_model_name,
                     "from": base_model
                 })
@@ -427,21 +483,39 @@ PARAMETER stop "Assistant:"
             
             self.last_cache_cleanup = current_time
     
-    def keep_model_loaded(self, model_name: str = None) -> bool:
-        """Keep the model loaded in memory for faster responses"""
+    def keep_alive_for(self, model_name: str) -> Optional[str]:
+        """keep_alive to send for a model: the pin for the pinned model, None (Ollama's default) otherwise"""
+        if not self.pinned_model or not model_name:
+            return None
+        # Ollama lists "llama2:latest" for a model requested as "llama2"
+        same_model = model_name.replace(':latest', '') == self.pinned_model.replace(':latest', '')
+        return self.keep_alive if same_model else None
+    
+    def keep_alive_option(self, model_name: str) -> Dict[str, str]:
+        """Generate request field that keeps the pinned model loaded, empty for any other model"""
+        keep_alive = self.keep_alive_for(model_name)
+        return {"keep_alive": keep_alive} if keep_alive is not None else {}
+    
+    def keep_model_loaded(self, model_name: str = None, keep_alive: Optional[str] = None) -> bool:
+        """Keep the model loaded in memory for faster responses, for keep_alive (e.g. "24h") if given"""
         if not model_name:
             model_name = self.get_best_available_model()
+        if keep_alive is None:
+            keep_alive = self.keep_alive_for(model_name)
         
         try:
             # Send a warm-up query to keep the model loaded
-            warmup_response = requests.post(f"{self.ollama_url}/api/generate", json={
+            request_data = {
                 "model": model_name,
                 "prompt": "Hello",
                 "stream": False,
                 "options": {
                     "num_predict": 1  # Very short response just to load the model
                 }
-            })
+            }
+            if keep_alive is not None:
+                request_data["keep_alive"] = keep_alive
+            warmup_response = self.session.post(f"{self.ollama_url}/api/generate", json=request_data)
             
             if warmup_response.status_code == 200:
                 print(f"🔥 Model {model_name} kept loaded in memory")
@@ -456,18 +530,22 @@ PARAMETER stop "Assistant:"
     
     def get_cache_key(self, question: str, context: str) -> str:
         """Generate a cache key for the query"""
-        import hashlib
-        content = f"{question}:{context}"
-        return hashlib.md5(content.encode()).hexdigest()
+        hasher = xxhash.xxh3_128() if XXHASH_AVAILABLE else hashlib.blake2b(digest_size=16)
+        hasher.update(question.encode())
+        hasher.update(b"\0")  # Separator so question/context boundaries cannot collide
+        hasher.update(context.encode())
+        return hasher.hexdigest()
     
     def query_ollama(self, question: str, context: str = "", stream: bool = False) -> Optional[str]:
         """Query the trained Ollama model with performance optimizations and personality prompt"""
-        if not self.check_ollama_status():
-            return None
-        
         # Clean up cache periodically
         self.cleanup_cache()
         
+        # Optimize context length for speed; truncating first also keeps the cache key hash short
+        max_context_length = 2000  # Limit context to improve speed
+        if len(context) > max_context_length:
+            context = context[:max_context_length] + "... [truncated for performance]"
+        
         # Check cache first
         cache_key = self.get_cache_key(question, context)
         if cache_key in self.response_cache:
@@ -483,22 +561,16 @@ PARAMETER stop "Assistant:"
             print(f"🚀 Cache miss for query: {question[:50]}...")
             self.cache_misses += 1
         
-        # Get the best available model
-        best_model = self.get_best_available_model()
+        # One model listing both confirms Ollama is up and picks the best model
+        available_models = self.fetch_model_names()
+        if available_models is None:
+            return None
+        best_model = self.get_best_available_model(available_models)
         print(f"🎯 Using best available model: {best_model}")
         
         try:
-            # Optimize context length for speed
-            max_context_length = 2000  # Limit context to improve speed
-            if len(context) > max_context_length:
-                context = context[:max_context_length] + "... [truncated for performance]"
-            
-            # Get personality prompt from server
-            try:
-                from server import get_personality_prompt
-                personality_prompt = get_personality_prompt()
-            except ImportError:
-                personality_prompt = "You are a helpful AI assistant. Provide accurate, clear, and helpful responses."
+            # Get personality prompt from the server
+            personality_prompt = self.personality_provider() if self.personality_provider else DEFAULT_PERSONALITY_PROMPT
             
             prompt = f"""{personality_prompt}
 
@@ -510,7 +582,8 @@ User question: {question}
 Please provide a helpful response based on the context provided. If the context doesn't contain enough information, say so clearly."""
 
             # Optimized parameters for speed
-            response = requests.post(f"{self.ollama_url}/api/generate", json={
+            response = self.session.post(f"{self.ollama_url}/api/generate", json={
+                **self.keep_alive_option(best_model),
                 "model": best_model,
                 "prompt": prompt,
                 "stream": stream,
@@ -526,7 +599,7 @@ Please provide a helpful response based on the context provided. If the context
             })
             
             if response.status_code == 200:
-                result = response.json()
+                result = json_loads(response.content)
                 response_text = result.get('response', '')
                 print(f"✅ Successfully used model: {best_model}")
                 
@@ -546,12 +619,13 @@ Please provide a helpful response based on the context provided. If the context
     
     def query_ollama_stream(self, question: str, context: str = ""):
         """Stream query to Ollama model - yields response chunks"""
-        if not self.check_ollama_status():
-            yield "data: {\"error\": \"Ollama not available\"}\n\n"
+        # One model listing both confirms Ollama is up and picks the model
+        available_models = self.fetch_model_names()
+        if available_models is None:
+            yield sse_event({"error": "Ollama not available"})
             return
         
         # Get the best available model - prefer base models over trained ones for streaming
-        available_models = self.get_available_models()
         best_model = "llama3.2:3b"  # Default to the base model
         
         # Try to find the base model first
@@ -571,12 +645,8 @@ Please provide a helpful response based on the context provided. If the context
             if len(context) > max_context_length:
                 context = context[:max_context_length] + "... [truncated for performance]"
             
-            # Get personality prompt from server
-            try:
-                from server import get_personality_prompt
-                personality_prompt = get_personality_prompt()
-            except ImportError:
-                personality_prompt = "You are a helpful AI assistant. Provide accurate, clear, and helpful responses."
+            # Get personality prompt from the server
+            personality_prompt = self.personality_provider() if self.personality_provider else DEFAULT_PERSONALITY_PROMPT
             
             prompt = f"""{personality_prompt}
 
@@ -590,7 +660,8 @@ Please provide a helpful response based on the context provided. If the context
             print(f"📤 Sending streaming request to Ollama with model: {best_model}")
             
             # Stream request to Ollama
-            response = requests.post(f"{self.ollama_url}/api/generate", json={
+            response = self.session.post(f"{self.ollama_url}/api/generate", json={
+                **self.keep_alive_option(best_model),
                 "model": best_model,
                 "prompt": prompt,
                 "stream": True,
@@ -608,32 +679,46 @@ Please provide a helpful response based on the context provided. If the context
             print(f"📥 Received response status: {response.status_code}")
             
             if response.status_code == 200:
+                # No per-token logging here: a blocking stdout write per token delays every chunk
+                chunk_count = 0
+                batcher = self.token_batcher() if self.token_batcher else None
                 for line in response.iter_lines():
                     if line:
-                        line_str = line.decode('utf-8')
-                        print(f"🔍 Processing line: {line_str[:100]}...")
-                        
                         try:
-                            data = json.loads(line_str)
+                            data = json_loads(line)
                             if 'response' in data:
-                                print(f"📝 Streaming chunk: {data['response'][:50]}...")
-                                yield f"data: {{\"response\": \"{data['response']}\"}}\n\n"
+                                chunk_count += 1
+                            if batcher is None:
+                                batch = data.get('response')
+                            elif 'response' in data:
+                                batch = batcher.add(data['response'])
+                            else:
+                                batch = batcher.poll()
+                            if batch:
+                                yield sse_event({"response": batch})
                             if data.get('done', False):
-                                print("✅ Streaming complete")
-                                yield f"data: {{\"done\": true}}\n\n"
+                                batch = batcher.flush() if batcher else None
+                                if batch:
+                                    yield sse_event({"response": batch})
+                                print(f"✅ Streaming complete ({chunk_count} chunks)")
+                                yield SSE_DONE_EVENT
                                 break
                         except json.JSONDecodeError as e:
                             print(f"⚠️ JSON decode error: {e}")
                             continue
+                # Send anything still buffered if the stream ended without a done line
+                batch = batcher.flush() if batcher else None
+                if batch:
+                    yield sse_event({"response": batch})
             else:
                 error_data = response.json() if response.content else {}
                 error_message = error_data.get("error", f"HTTP {response.status_code}")
                 print(f"❌ Ollama error: {error_message}")
-                yield f"data: {{\"error\": \"{error_message}\"}}\n\n"
+                yield sse_event({"error": error_message})
                     
         except Exception as e:
             print(f"❌ Exception with streaming model {best_model}: {e}")
-            yield f"data: {{\"error\": \"{str(e)}\"}}\n\n"
+            yield sse_event({"error": str(e)})
     
     def train(self, knowledge_base_path: str = "/app/knowledge_base") -> Dict[str, Any]:
         """Main training function (legacy - use train_with_model instead)"""
@@ -939,7 +1024,7 @@ PARAMETER stop "Assistant:"
             
             # Use requests to call Ollama create API with from parameter for simpler approach
             # Note: This creates a custom model without training data for now
-            create_response = requests.post(f"{self.ollama_url}/api/create", json={
+            create_response = self.session.post(f"{self.ollama_url}/api/create", json={
                 "name": custom_model_name,
                 "from": base_model,
                 "stream": False
@@ -0,0 +1,143 @@
+#!/usr/bin/env python3
+"""
+Semantic Response Cache
+Caches AI answers keyed by the question embedding so paraphrased questions skip the LLM call
+"""
+
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Tuple
+
+import faiss
+import numpy as np
+
+
+class SemanticCache:
+    def __init__(self, model_name: str = "sentence-transformers/all-MiniLM-L6-v2",
+                 threshold: float = 0.9, max_entries: int = 10000, ttl: int = 3600):
+        self.model_name = model_name
+        self.threshold = threshold  # Minimum cosine similarity for a query-to-query hit
+        self.max_entries = max_entries  # LRU eviction beyond this many entries
+        self.ttl = ttl  # 1 hour, same as the Ollama trainer response cache
+        self.model = None
+        self._load_failed = False  # Set once the model cannot be loaded, the cache then stays a no-op
+        self.index = None
+        self.entries = OrderedDict()  # id -> entry, least recently used first
+        self.next_id = 0
+        self.hits = 0
+        self.misses = 0
+        self.lock = threading.Lock()
+        self.model_lock = threading.Lock()
+
+    def _load_model(self):
+        """Load the embedding model on first use so server startup is not blocked, or None if it failed"""
+        if self.model is None and not self._load_failed:
+            with self.model_lock:
+                if self.model is None and not self._load_failed:
+                    try:
+                        from sentence_transformers import SentenceTransformer
+                        print(f"🔄 Loading semantic cache embedding model: {self.model_name}")
+                        model = SentenceTransformer(self.model_name)
+                        dimension = model.get_sentence_embedding_dimension()
+                    except Exception as e:
+                        # Retrying would repeat the (possibly hub download) failure on every request
+                        self._load_failed = True
+                        print(f"⚠️  Semantic cache disabled, embedding model failed to load: {e}")
+                        return None
+                    # Inner product over L2-normalized vectors is cosine similarity
+                    self.index = faiss.IndexIDMap2(faiss.IndexFlatIP(dimension))
+                    self.model = model
+                    print(f"✅ Semantic cache ready (dimension {dimension})")
+        return self.model
+
+    def embed(self, text: str) -> Optional[np.ndarray]:
+        """Embed a question as a normalized (1, dim) float32 vector, or None without a model"""
+        model = self._load_model()
+        if model is None:
+            return None
+        embedding = np.asarray(model.encode([text], convert_to_numpy=True), dtype='float32')
+        faiss.normalize_L2(embedding)
+        return embedding
+
+    def lookup(self, question: str, scope: str = "") -> Tuple[Optional[Dict[str, Any]], Optional[np.ndarray]]:
+        """Find a cached answer for a similar question within the same scope.
+
+        Returns the cached entry (or None) together with the question embedding so
+        callers can pass it to store() on a miss without embedding twice. The
+        embedding is None when the model could not be loaded.
+        """
+        embedding = self.embed(question)
+        if embedding is None:
+            return None, None
+
+        with self.lock:
+            if self.index.ntotal:
+                k = min(self.index.ntotal, 8)
+                scores, ids = self.index.search(embedding, k)
+                now = time.time()
+                for score, entry_id in zip(scores[0], ids[0]):
+                    if entry_id < 0 or score < self.threshold:
+                        break
+                    entry = self.entries.get(int(entry_id))
+                    if entry is None:
+                        continue
+                    if now - entry['timestamp'] > self.ttl:
+                        self._remove(int(entry_id))
+                        continue
+                    if entry['scope'] != scope:
+                        continue
+                    self.entries.move_to_end(int(entry_id))
+                    self.hits += 1
+                    print(f"🚀 Semantic cache hit ({score:.3f}) for query: {question[:50]}...")
+                    return entry, embedding
+
+            self.misses += 1
+            return None, embedding
+
+    def store(self, embedding: np.ndarray, question: str, response: str,
+              sources: Optional[List[Dict[str, Any]]] = None, scope: str = ""):
+        """Add an answer to the cache, evicting the least recently used entries"""
+        if embedding is None:
+            return
+        with self.lock:
+            entry_id = self.next_id
+            self.next_id += 1
+            self.index.add_with_ids(embedding, np.array([entry_id], dtype='int64'))
+            self.entries[entry_id] = {
+                'question': question,
+                'response': response,
+                'sources': sources or [],
+                'scope': scope,
+                'timestamp': time.time()
+            }
+
+            while len(self.entries) > self.max_entries:
+                oldest_id = next(iter(self.entries))
+                self._remove(oldest_id)
+
+    def _remove(self, entry_id: int):
+        """Drop an entry from both the index and the entry table (caller holds the lock)"""
+        self.entries.pop(entry_id, None)
+        self.index.remove_ids(np.array([entry_id], dtype='int64'))
+
+    def clear(self):
+        """Forget all cached answers, e.g. after the knowledge base changes"""
+        with self.lock:
+            self.entries.clear()
+            if self.index is not None:
+                self.index.reset()
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Get cache statistics"""
+        return {
+            "size": len(self.entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "threshold": self.threshold,
+            "model_loaded": self.model is not None,
+            "load_failed": self._load_failed
+        }
+
+# Global semantic cache instance
+semantic_cache = SemanticCache()
@@ -0,0 +1,128 @@
+#!/usr/bin/env python3
+"""
+Semantic Section Search
+Ranks knowledge base sections by embedding similarity so paraphrased questions still find their answer
+"""
+
+import hashlib
+import os
+import threading
+from typing import List, Optional, Tuple
+
+import faiss
+import numpy as np
+
+
+class SemanticSearch:
+    def __init__(self, model_name: str = "sentence-transformers/all-MiniLM-L6-v2",
+                 cache_file: str = "/app/section_embeddings.npy", batch_size: int = 64,
+                 hnsw_threshold: int = 10000):
+        self.model_name = model_name
+        self.cache_file = cache_file  # Section embeddings, memory-mapped on later boots
+        self.index_file = os.path.splitext(cache_file)[0] + ".faiss"  # Built index, HNSW graphs are slow to rebuild
+        self.key_file = cache_file + ".key"  # Digest of the section texts the saved files belong to
+        self.batch_size = batch_size
+        self.hnsw_threshold = hnsw_threshold  # Below this many sections an exact scan is fast enough
+        self.model = None
+        self.index = None  # 8-bit quantized inner-product index over the L2-normalized section embeddings
+        self.sections_key = None
+        self.lock = threading.Lock()
+        self.model_lock = threading.Lock()
+
+    def _load_model(self):
+        """Load the embedding model on first use so server startup is not blocked"""
+        if self.model is None:
+            with self.model_lock:
+                if self.model is None:
+                    from sentence_transformers import SentenceTransformer
+                    print(f"🔄 Loading semantic search embedding model: {self.model_name}")
+                    self.model = SentenceTransformer(self.model_name)
+                    print("✅ Semantic search model ready")
+        return self.model
+
+    def encode(self, texts: List[str]) -> np.ndarray:
+        """Embed texts as normalized float32 rows"""
+        model = self._load_model()
+        return np.asarray(model.encode(texts, batch_size=self.batch_size, normalize_embeddings=True,
+                                       convert_to_numpy=True), dtype='float32')
+
+    def _cached_key(self) -> Optional[str]:
+        """Key of the sections the saved embeddings and index were built from"""
+        try:
+            with open(self.key_file, 'r', encoding='utf-8') as f:
+                return f.read().strip()
+        except OSError:
+            return None
+
+    def _load_cached(self):
+        """Load the saved index, or memory-map the saved embeddings so only the index is rebuilt"""
+        try:
+            return faiss.read_index(self.index_file), None
+        except RuntimeError:
+            pass
+        try:
+            return None, np.load(self.cache_file, mmap_mode='r')
+        except (OSError, ValueError):
+            return None, None
+
+    def _save_cached(self, key: str, embeddings: np.ndarray, index):
+        """Persist embeddings and index so the next boot skips re-encoding the knowledge base"""
+        try:
+            np.save(self.cache_file, embeddings)
+            faiss.write_index(index, self.index_file)
+            with open(self.key_file, 'w', encoding='utf-8') as f:
+                f.write(key)
+        except (OSError, RuntimeError) as e:
+            print(f"⚠️  Could not save section embeddings: {e}")
+
+    def build(self, texts: List[str]):
+        """Embed all section texts, reusing the saved matrix when the sections are unchanged"""
+        digest = hashlib.blake2b(digest_size=16)
+        for text in texts:
+            digest.update(text.encode('utf-8'))
+            digest.update(b"\0")
+        key = f"{self.model_name}:{len(texts)}:{digest.hexdigest()}"
+
+        with self.lock:
+            if key == self.sections_key:
+                return
+            index, embeddings = self._load_cached() if self._cached_key() == key else (None, None)
+            if index is None:
+                if embeddings is None:
+                    print(f"🔄 Embedding {len(texts)} knowledge base sections...")
+                    embeddings = self.encode(texts)
+                index = self._build_index(embeddings)
+                self._save_cached(key, embeddings, index)
+            self.index = index
+            self.sections_key = key
+
+    def _build_index(self, embeddings: np.ndarray):
+        """Quantize the embeddings to one byte per dimension, a quarter of the float32 matrix to scan.
+
+        Large knowledge bases get an HNSW graph on top so a query visits O(log n) sections.
+        """
+        embeddings = np.ascontiguousarray(embeddings, dtype='float32')
+        if len(embeddings) >= self.hnsw_threshold:
+            index = faiss.IndexHNSWSQ(embeddings.shape[1], faiss.ScalarQuantizer.QT_8bit, 32,
+                                      faiss.METRIC_INNER_PRODUCT)
+            index.hnsw.efConstruction = 100
+            index.hnsw.efSearch = 64
+        else:
+            index = faiss.IndexScalarQuantizer(embeddings.shape[1], faiss.ScalarQuantizer.QT_8bit,
+                                               faiss.METRIC_INNER_PRODUCT)
+        if len(embeddings):
+            index.train(embeddings)
+            index.add(embeddings)
+        return index
+
+    def search(self, query: str, num_results: int) -> Tuple[np.ndarray, np.ndarray]:
+        """Return (scores, section ids) of the most similar sections, best first"""
+        index = self.index
+        if index is None or not index.ntotal or num_results <= 0:
+            return np.empty(0, dtype='float32'), np.empty(0, dtype=np.int64)
+
+        scores, ids = index.search(self.encode([query]), min(num_results, index.ntotal))
+        return scores[0], ids[0]
+
+# Global semantic search instance
+semantic_search = SemanticSearch()
@@ -1,6 +1,19 @@
 # server.py
 import os
+import re
 import json
+import mmap
+import pickle
+import hashlib
+import glob
+import zipfile
+import threading
+import requests
+from requests.adapters import HTTPAdapter
+import numpy as np
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+from collections import OrderedDict
 from dotenv import load_dotenv
 from datetime import datetime
 import time # Added for fast_llamaindex_query
@@ -11,13 +24,12 @@ CREWAI_AVAILABLE = False
 # Feedback system removed - not used in current interface
 FEEDBACK_AVAILABLE = False
 
-# Import Ollama trainer
+# Import Ollama trainer (whether Ollama itself is reachable is checked in the background at startup)
 try:
     from ollama_trainer import OllamaTrainer
-    OLLAMA_AVAILABLE = True
-    print("✅ Ollama trainer available")
+    OLLAMA_TRAINER_IMPORTED = True
 except ImportError as e:
-    OLLAMA_AVAILABLE = False
+    OLLAMA_TRAINER_IMPORTED = False
     print(f"⚠️  Ollama trainer not available: {e}")
 
 # Import Model Manager
@@ -38,16 +50,44 @@ except ImportError as e:
     FILE_TOOLS_AVAILABLE = False
     print(f"⚠️  File tools integration not available: {e}")
 
+# Import Semantic Cache
+try:
+    from semantic_cache import semantic_cache
+    SEMANTIC_CACHE_AVAILABLE = True
+    print("✅ Semantic cache available")
+except ImportError as e:
+    SEMANTIC_CACHE_AVAILABLE = False
+    print(f"⚠️  Semantic cache not available: {e}")
+
+# Import Semantic Search (opt-in, replaces keyword ranking with embedding similarity)
+try:
+    from semantic_search import semantic_search
+    SEMANTIC_SEARCH_AVAILABLE = True
+except ImportError as e:
+    SEMANTIC_SEARCH_AVAILABLE = False
+    print(f"⚠️  Semantic search not available: {e}")
+SEMANTIC_SEARCH_ENABLED = SEMANTIC_SEARCH_AVAILABLE and os.getenv("SEMANTIC_SEARCH", "false").lower() == "true"
+if SEMANTIC_SEARCH_ENABLED:
+    print("✅ Semantic search enabled")
+
 # Hybrid search system removed - not used in current interface
 HYBRID_SEARCH_AVAILABLE = False
 
 # Global variables for performance optimization
-OLLAMA_AVAILABLE = False
+OLLAMA_AVAILABLE = False  # Set by the startup check once Ollama responds
 OLLAMA_TRAINER = None
 HYBRID_SEARCH_SYSTEM = None
 MODEL_PRELOADED = False
 PERSONALITY_PROMPT = ""
+# Selected behavior file, the mtime last read and when it was last checked (time.monotonic())
+PERSONALITY_STATE = {'filename': "behavior.md", 'mtime': -1, 'checked': float('-inf')}
+PERSONALITY_CHECK_INTERVAL = 5  # seconds between behavior file stats on the request path
 kb = []  # Global knowledge base variable
+KB_BY_NAME = {}  # Knowledge base documents keyed by filename (relative path)
+KB_CACHE_FILE = "/app/knowledge_base_cache.pkl"  # Parsed knowledge base, reused across restarts
+KB_CACHE_VERSION = 3
+KB_LOAD_WORKERS = 16  # Concurrent file reads when loading the knowledge base
+KB_CACHE = None  # In-memory copy of the parsed knowledge base cache, so reloads only re-read changed files
 
 # Conversation memory system
 conversation_history = []
@@ -57,9 +97,11 @@ def load_personality_prompt(behavior_filename: str = "behavior.md"):
     """Load personality/behavior prompt from specified behavior file"""
     global PERSONALITY_PROMPT
     
+    PERSONALITY_STATE['filename'] = behavior_filename
     try:
         behavior_file = f"/app/behavior_model/{behavior_filename}"
-        if os.path.exists(behavior_file):
+        PERSONALITY_STATE['mtime'] = get_file_mtime(behavior_file)
+        if PERSONALITY_STATE['mtime'] is not None:
             with open(behavior_file, 'r', encoding='utf-8') as f:
                 PERSONALITY_PROMPT = f.read().strip()
                 print(f"✅ Loaded personality prompt from {behavior_filename} ({len(PERSONALITY_PROMPT)} characters)")
@@ -70,9 +112,21 @@ def load_personality_prompt(behavior_filename: str = "behavior.md"):
         print(f"❌ Error loading personality prompt: {e}")
         PERSONALITY_PROMPT = "You are a helpful AI assistant. Provide accurate, clear, and helpful responses."
 
+def get_file_mtime(path):
+    """Return a file's mtime in nanoseconds, or None if it does not exist"""
+    try:
+        return os.stat(path).st_mtime_ns
+    except OSError:
+        return None
+
 def get_personality_prompt():
-    """Get the current personality prompt"""
-    global PERSONALITY_PROMPT
+    """Get the current personality prompt, re-reading the behavior file only when it changes"""
+    now = time.monotonic()
+    if now - PERSONALITY_STATE['checked'] >= PERSONALITY_CHECK_INTERVAL:
+        PERSONALITY_STATE['checked'] = now
+        behavior_file = f"/app/behavior_model/{PERSONALITY_STATE['filename']}"
+        if get_file_mtime(behavior_file) != PERSONALITY_STATE['mtime']:
+            load_personality_prompt(PERSONALITY_STATE['filename'])
     return PERSONALITY_PROMPT
 
 def add_to_conversation_history(user_question: str, ai_response: str):
@@ -114,6 +168,41 @@ def get_conversation_context() -> str:
     
     return context
 
+def warm_models():
+    """Load the trainer's model, pinned for MODEL_KEEP_ALIVE, and the selected CLI model into Ollama"""
+    # Only the trainer's default model is pinned; every request to it repeats the pin, other models
+    # (fallbacks, a different CLI selection) keep Ollama's default so they don't hold memory for hours
+    model_name = OLLAMA_TRAINER.get_best_available_model()
+    OLLAMA_TRAINER.pinned_model = model_name
+    success = OLLAMA_TRAINER.keep_model_loaded(model_name)
+    if MODEL_MANAGER_AVAILABLE:
+        model_manager.pinned_model = model_name
+        model_manager.start_model(model_manager.get_selected_model())
+    return success
+
+WARMING_MODELS = set()  # Models with a background load in flight
+WARMING_LOCK = threading.Lock()
+
+def warm_model_in_background(model_name):
+    """Load a model into Ollama on a daemon thread unless it is already running or loading"""
+    if not model_name:
+        return
+    with WARMING_LOCK:
+        if model_name in WARMING_MODELS:
+            return
+        WARMING_MODELS.add(model_name)
+    
+    def warm():
+        try:
+            # Asking Ollama what is loaded can stall, so it happens here rather than on the request thread
+            if model_name not in model_manager.get_running_models():
+                model_manager.start_model(model_name)
+        finally:
+            with WARMING_LOCK:
+                WARMING_MODELS.discard(model_name)
+    
+    threading.Thread(target=warm, daemon=True).start()
+
 def preload_ollama_model():
     """Preload the best available Ollama model for faster responses"""
     global OLLAMA_TRAINER, MODEL_PRELOADED
@@ -121,7 +210,7 @@ def preload_ollama_model():
     try:
         if OLLAMA_TRAINER and not MODEL_PRELOADED:
             print("🚀 Preloading Ollama model for faster responses...")
-            success = OLLAMA_TRAINER.keep_model_loaded()
+            success = warm_models()
             if success:
                 MODEL_PRELOADED = True
                 print("✅ Model preloaded successfully")
@@ -130,199 +219,498 @@ def preload_ollama_model():
     except Exception as e:
         print(f"❌ Error preloading model: {e}")
 
-# Initialize Ollama trainer on startup
-try:
-    from ollama_trainer import OllamaTrainer
-    ollama_url = os.getenv("OLLAMA_BASE_URL", "http://localhost:11434")
-    OLLAMA_TRAINER = OllamaTrainer(ollama_url)
-    if OLLAMA_TRAINER.check_ollama_status():
-        OLLAMA_AVAILABLE = True
-        print("✅ Ollama trainer available")
-        # Preload the model after a short delay
-        import threading
-        def delayed_preload():
-            import time
-            time.sleep(5)  # Wait 5 seconds for everything to start
-            preload_ollama_model()
-        
-        threading.Thread(target=delayed_preload, daemon=True).start()
-    else:
+def delayed_preload():
+    """Check that Ollama is reachable, then preload the model after a short delay"""
+    global OLLAMA_AVAILABLE
+    
+    if not OLLAMA_TRAINER.check_ollama_status():
         print("⚠️ Ollama trainer not available: Ollama is not running or accessible")
-except ImportError as e:
-    print(f"⚠️ Ollama trainer not available: {e}")
+        return
+    OLLAMA_AVAILABLE = True
+    print("✅ Ollama trainer available")
+    time.sleep(5)  # Wait 5 seconds for everything to start
+    preload_ollama_model()
+    
+    # Renew the pin in case Ollama evicted a model to make room for another
+    while True:
+        time.sleep(MODEL_KEEP_ALIVE_INTERVAL)
+        try:
+            warm_models()
+        except Exception as e:
+            print(f"⚠️ Could not refresh preloaded models: {e}")
 
-# Hybrid search system removed - not used in current interface
-HYBRID_SEARCH_SYSTEM = None
+OLLAMA_TRAINER_LOCK = threading.Lock()
 
-# Load personality prompt on startup
-load_personality_prompt()
+def get_ollama_trainer():
+    """Return the shared Ollama trainer, creating it on first use if startup did not"""
+    global OLLAMA_TRAINER
+    if OLLAMA_TRAINER is None:
+        # Concurrent first requests must not each build a trainer with its own cache and session
+        with OLLAMA_TRAINER_LOCK:
+            if OLLAMA_TRAINER is None:
+                trainer = OllamaTrainer(os.getenv("OLLAMA_BASE_URL", "http://localhost:11434"))
+                trainer.personality_provider = get_personality_prompt
+                trainer.token_batcher = TokenBatcher
+                trainer.keep_alive = MODEL_KEEP_ALIVE
+                OLLAMA_TRAINER = trainer
+    return OLLAMA_TRAINER
 
 # Load environment variables from .env file
 load_dotenv()
 
+# How long Ollama keeps the preloaded default model in memory, and how often the pin is renewed
+MODEL_KEEP_ALIVE = os.getenv("OLLAMA_KEEP_ALIVE", "24h")
+MODEL_KEEP_ALIVE_INTERVAL = 20 * 60  # seconds
+if MODEL_MANAGER_AVAILABLE:
+    model_manager.keep_alive = MODEL_KEEP_ALIVE
+
+# The semantic answer cache loads an embedding model on first use, so like semantic search it is opt-in
+SEMANTIC_CACHE_ENABLED = SEMANTIC_CACHE_AVAILABLE and os.getenv("SEMANTIC_CACHE", "false").lower() == "true"
+if SEMANTIC_CACHE_ENABLED:
+    print("✅ Semantic cache enabled")
+
+# Streamed tokens are coalesced until this many characters or seconds have built up
+STREAM_BATCH_CHARS = int(os.getenv("STREAM_BATCH_CHARS", "32"))
+STREAM_BATCH_DELAY = float(os.getenv("STREAM_BATCH_DELAY", "0.02"))
+
+class TokenBatcher:
+    """Join streamed tokens into fewer events; the first token is always sent on its own.
+
+    A buffered token is due once it has waited max_delay; callers poll() on every streamed line
+    so the deadline is honoured even when the lines in between carry no token.
+    """
+    
+    def __init__(self, max_chars=STREAM_BATCH_CHARS, max_delay=STREAM_BATCH_DELAY):
+        self.max_chars = max_chars
+        self.max_delay = max_delay
+        self.parts = []
+        self.size = 0
+        self.pending_since = None  # When the oldest buffered token arrived
+        self.flushed = False
+    
+    def add(self, token):
+        """Buffer a token, returning the batched text when it is due to be sent"""
+        if not self.parts:
+            self.pending_since = time.monotonic()
+        self.parts.append(token)
+        self.size += len(token)
+        if not self.flushed or self.size >= self.max_chars:
+            return self.flush()
+        return self.poll()
+    
+    def poll(self):
+        """Return the buffered text once its oldest token has waited max_delay"""
+        if self.parts and time.monotonic() - self.pending_since >= self.max_delay:
+            return self.flush()
+        return None
+    
+    def flush(self):
+        """Return any buffered text and start a new batch"""
+        self.flushed = True
+        if not self.parts:
+            return None
+        text = "".join(self.parts)
+        self.parts = []
+        self.size = 0
+        return text
+
+# Initialize Ollama trainer on startup without blocking import on a network round-trip
+if OLLAMA_TRAINER_IMPORTED:
+    get_ollama_trainer()
+    threading.Thread(target=delayed_preload, daemon=True).start()
+
+# Hybrid search system removed - not used in current interface
+HYBRID_SEARCH_SYSTEM = None
+
 # --- 1. Load the Knowledge Base ---
+def read_markdown_file(file_path):
+    """Read a UTF-8 markdown file by decoding straight from a read-only memory map."""
+    with open(file_path, 'rb') as f:
+        if os.fstat(f.fileno()).st_size == 0:
+            # mmap refuses to map empty files
+            return ""
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+            content = str(mapped, 'utf-8')
+    if '\r' in content:
+        # Match text-mode reads, which translate Windows and old Mac line endings
+        content = content.replace('\r\n', '\n').replace('\r', '\n')
+    return content
+
+def make_section(header, lines):
+    """Build a section dict, pre-tokenized (header included) so searches only intersect sets."""
+    content = '\n'.join(lines)
+    header_lower = header.lower()
+    return {
+        'header': header,
+        'content': content,
+        'header_lower': header_lower,
+        'words': frozenset(header_lower.split()).union(content.lower().split())
+    }
+
+def iter_sections(content):
+    """Yield markdown sections one at a time, split on headers and paragraphs."""
+    current_section = []
+    current_header = ""
+    
+    for line in content.split('\n'):
+        stripped = line.strip()
+        if stripped.startswith('#'):  # New header
+            if current_section:
+                yield make_section(current_header, current_section)
+            current_section = []
+            current_header = stripped
+        else:
+            if stripped or current_section:  # Keep empty lines only if we have content
+                current_section.append(line)
+    
+    # Emit the last section
+    if current_section:
+        yield make_section(current_header, current_section)
+
+def split_into_sections(content):
+    """Split markdown content into sections based on headers and paragraphs."""
+    return list(iter_sections(content))
+
+def load_kb_cache():
+    """Load the parsed knowledge base cache written by a previous run"""
+    try:
+        if os.path.exists(KB_CACHE_FILE):
+            with open(KB_CACHE_FILE, 'rb') as f:
+                cache = pickle.load(f)
+            if cache.get('version') == KB_CACHE_VERSION:
+                return cache
+    except Exception as e:
+        print(f"⚠️ Ignoring unreadable knowledge base cache: {e}")
+    return {'version': KB_CACHE_VERSION, 'files': {}, 'documents': {}}
+
+def save_kb_cache(cache):
+    """Persist the parsed knowledge base cache atomically"""
+    try:
+        temp_file = f"{KB_CACHE_FILE}.tmp"
+        with open(temp_file, 'wb') as f:
+            pickle.dump(cache, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(temp_file, KB_CACHE_FILE)
+    except Exception as e:
+        print(f"⚠️ Could not save knowledge base cache: {e}")
+
 def load_knowledge_base(folder_path="/app/knowledge_base"):
     """Loads all .md files from a folder and its subfolders recursively into a list of dictionaries."""
+    global KB_CACHE
     knowledge = []
     print(f"Loading documents from {folder_path} and subfolders...")
     
-    def load_recursive(current_path, base_path):
-        """Recursively load markdown files from current path and subdirectories."""
+    # Files whose (mtime, size) match the cache reuse their parsed content and sections;
+    # files with identical content share one parsed entry keyed by content hash.
+    # After the first load the cache stays in memory, so a reload only reads added or changed files.
+    cache = KB_CACHE if KB_CACHE is not None else load_kb_cache()
+    files = {}
+    documents = {}
+    parsed_count = 0
+    markdown_paths = []
+    
+    def collect_recursive(current_path):
+        """Recursively collect markdown file paths from current path and subdirectories."""
         try:
-            for item in os.listdir(current_path):
-                item_path = os.path.join(current_path, item)
-                
-                if os.path.isdir(item_path):
-                    # Recursively search subdirectories
-                    load_recursive(item_path, base_path)
-                elif item.endswith(".md"):
-                    # Calculate relative path from base knowledge_base directory
-                    relative_path = os.path.relpath(item_path, base_path)
-                    
-                    with open(item_path, 'r', encoding='utf-8') as f:
-                        content = f.read()
-                        knowledge.append({
-                            "filename": relative_path,  # Include folder path
-                            "content": content,
-                            "full_path": item_path
-                        })
+            with os.scandir(current_path) as entries:
+                for entry in entries:
+                    if entry.is_dir():
+                        # Recursively search subdirectories
+                        collect_recursive(entry.path)
+                    elif entry.name.endswith(".md"):
+                        markdown_paths.append(entry.path)
         except PermissionError:
             print(f"Permission denied accessing: {current_path}")
         except Exception as e:
             print(f"Error accessing {current_path}: {e}")
     
-    # Start recursive search from the base folder
-    load_recursive(folder_path, folder_path)
-    print(f"Loaded {len(knowledge)} documents from {folder_path} and subfolders.")
+    def read_file(item_path):
+        """Stat a file and read it unless the cached parse is still current."""
+        try:
+            stat = os.stat(item_path)
+            cached = cache['files'].get(item_path)
+            if cached and cached[:2] == (stat.st_mtime_ns, stat.st_size) and cached[2] in cache['documents']:
+                return item_path, stat, cached[2], None
+            
+            content = read_markdown_file(item_path)
+            digest = hashlib.blake2b(content.encode('utf-8'), digest_size=16).hexdigest()
+            return item_path, stat, digest, content
+        except Exception as e:
+            print(f"Error reading {item_path}: {e}")
+            return None
+    
+    # Start recursive search from the base folder, then read the files concurrently
+    collect_recursive(folder_path)
+    with ThreadPoolExecutor(max_workers=KB_LOAD_WORKERS) as executor:
+        results = list(executor.map(read_file, markdown_paths))
+    
+    for result in results:
+        if result is None:
+            continue
+        item_path, stat, digest, content = result
+        
+        parsed = documents.get(digest) or cache['documents'].get(digest)
+        if parsed is None:
+            parsed = {'content': content, 'sections': split_into_sections(content)}
+            parsed_count += 1
+        
+        files[item_path] = (stat.st_mtime_ns, stat.st_size, digest)
+        documents[digest] = parsed
+        knowledge.append({
+            "filename": os.path.relpath(item_path, folder_path),  # Include folder path
+            "content": parsed['content'],
+            "sections": parsed['sections'],
+            "full_path": item_path
+        })
+    
+    if files != cache['files']:
+        save_kb_cache({'version': KB_CACHE_VERSION, 'files': files, 'documents': documents})
+    # Deleted files drop out here since only documents still on disk are kept
+    KB_CACHE = {'version': KB_CACHE_VERSION, 'files': files, 'documents': documents}
+    
+    print(f"Loaded {len(knowledge)} documents from {folder_path} and subfolders ({parsed_count} parsed, {len(knowledge) - parsed_count} from cache).")
     return knowledge
 
 def reload_knowledge_base():
     """Reload the knowledge base from disk"""
-    global kb
-    kb = load_knowledge_base()
+    global kb, KB_BY_NAME
+    knowledge = load_knowledge_base()
+    KB_BY_NAME = {doc['filename']: doc for doc in knowledge}
+    kb = knowledge
     return len(kb)
 
 # --- 2. Search for Relevant Context ---
-def search_knowledge_base(query, knowledge_base, num_results=5):  # Increased to 5 results for better coverage
-    """
-    Search for relevant sections in markdown files and extract the most relevant paragraphs.
-    """
-    def split_into_sections(content):
-        """Split markdown content into sections based on headers and paragraphs."""
-        sections = []
-        current_section = []
-        current_header = ""
-        
-        lines = content.split('\n')
-        for line in lines:
-            if line.strip().startswith('#'):  # New header
-                if current_section:
-                    sections.append({
-                        'header': current_header,
-                        'content': '\n'.join(current_section)
-                    })
-                current_section = []
-                current_header = line.strip()
-            else:
-                if line.strip() or current_section:  # Keep empty lines only if we have content
-                    current_section.append(line)
-        
-        # Add the last section
-        if current_section:
-            sections.append({
-                'header': current_header,
-                'content': '\n'.join(current_section)
-            })
-        return sections
-
-    query_words = set(query.lower().split())
-    results = []
-    
-    # Feedback enhancement removed - not used in current interface
+_SEARCH_INDEX = {'kb': None}  # Vectorized scoring tables for the last searched knowledge base
+
+def build_search_index(knowledge_base):
+    """Flatten all sections into arrays plus word postings so a query is scored in one pass"""
+    postings = {}
+    sections = []
+    section_docs = []
+    headers = []
+    length_bonus = []
+    docs = []
+    filenames = []
+    folders = {}  # Distinct lowercased folder -> folder id, many documents share a folder
+    doc_folders = []
     
-    for doc in knowledge_base:
+    for doc_index, doc in enumerate(knowledge_base):
         # Extract folder path from filename (everything before the last '/')
         filename_parts = doc['filename'].split('/')
         folder_path = '/'.join(filename_parts[:-1]) if len(filename_parts) > 1 else 'root'
         filename = filename_parts[-1] if len(filename_parts) > 0 else doc['filename']
+        docs.append((doc, folder_path))
+        filenames.append(filename.lower())
+        doc_folders.append(folders.setdefault(folder_path.lower(), len(folders)))
         
-        # Check if query matches filename or folder path (high priority)
-        filename_lower = filename.lower()
-        folder_lower = folder_path.lower()
-        query_lower = query.lower()
-        
-        # High score for filename/folder matches
-        filename_match_score = 0
-        if any(word in filename_lower for word in query_words):
-            filename_match_score = 15  # Higher priority for filename matches
-        if any(word in folder_lower for word in query_words):
-            filename_match_score = 12   # Higher priority for folder matches
-        
-        # Extra bonus for exact folder name matches (like "QA" folder)
-        if query_lower in folder_lower or folder_lower in query_lower:
-            filename_match_score += 10  # Significant bonus for exact folder matches
-        
-        sections = split_into_sections(doc['content'])
-        
-        for section in sections:
+        for section in doc['sections']:
             content = section['content']
             if not content.strip():
                 continue
-            
-            # Calculate relevance score based on query words in the section
-            # Include both header and content in the search
-            search_text = (section['header'] + ' ' + content).lower()
-            section_words = set(search_text.split())
-            common_words = query_words.intersection(section_words)
-            
-            # Score calculation: words found + bonus for header matches
-            score = len(common_words)
-            if any(word in section['header'].lower() for word in query_words):
-                score += 5  # Higher bonus points for header matches
-            
-            # Bonus for content length (more detailed content gets higher score)
-            content_length_bonus = min(len(content.split()) / 100, 3)  # Max 3 points for long content
-            score += content_length_bonus
-            
-            # Add filename/folder match score
-            score += filename_match_score
-            
-            # Feedback enhancement removed - not used in current interface
-            
-            # Only include sections with matches (including filename matches)
-            if score > 0:
-                results.append({
-                    "score": score,
-                    "section": content.strip(),
-                    "header": section['header'],
-                    "filename": doc['filename'],
-                    "folder_path": folder_path,
-                    "relevance": round((score / (len(query_words) + 2)) * 100, 2)  # Adjusted for header bonus
-                })
+            section_id = len(sections)
+            sections.append(section)
+            section_docs.append(doc_index)
+            headers.append(section['header_lower'])
+            # Bonus for content length (more detailed content gets higher score, max 3 points)
+            length_bonus.append(min(len(content.split()) / 100, 3))
+            for word in section['words']:
+                postings.setdefault(word, []).append(section_id)
     
-    # Sort by relevance score
-    results.sort(key=lambda x: x['score'], reverse=True)
-    return results[:num_results]
+    return {
+        'kb': knowledge_base,
+        'size': len(knowledge_base),
+        'postings': {word: np.array(ids, dtype=np.int32) for word, ids in postings.items()},
+        'sections': sections,
+        'section_docs': np.array(section_docs, dtype=np.int32),
+        'headers': np.array(headers, dtype=str),
+        'length_bonus': np.array(length_bonus, dtype=np.float64),
+        'docs': docs,
+        'filenames': np.array(filenames, dtype=str),
+        'folders': list(folders),
+        'doc_folders': np.array(doc_folders, dtype=np.int32),
+        'results': OrderedDict()
+    }
+
+def get_search_index(knowledge_base):
+    """Return the scoring tables for this knowledge base, rebuilding them when it changes"""
+    global _SEARCH_INDEX
+    index = _SEARCH_INDEX
+    if index['kb'] is not knowledge_base or index['size'] != len(knowledge_base):
+        # Swap in a fresh dict so searches still holding the old tables never see a half-replaced index
+        index = build_search_index(knowledge_base)
+        _SEARCH_INDEX = index
+    return index
+
+_SEMANTIC_STATE = {'sections': None}  # Section list the semantic search embeddings were built from
+
+def semantic_search_sections(query, index, num_results):
+    """Rank sections by embedding similarity, or return None so keyword search is used instead"""
+    try:
+        if _SEMANTIC_STATE['sections'] is not index['sections']:
+            semantic_search.build([section['content'] for section in index['sections']])
+            _SEMANTIC_STATE['sections'] = index['sections']
+        scores, section_ids = semantic_search.search(query, num_results)
+    except Exception as e:
+        print(f"⚠️  Semantic search failed, using keyword search: {e}")
+        return None
+    
+    results = []
+    for score, section_id in zip(scores.tolist(), section_ids.tolist()):
+        if score <= 0:
+            break
+        doc, folder_path = index['docs'][index['section_docs'][section_id]]
+        section = index['sections'][section_id]
+        results.append({
+            "score": score,
+            "section": section['content'].strip(),
+            "header": section['header'],
+            "filename": doc['filename'],
+            "folder_path": folder_path,
+            "relevance": round(score * 100, 2)  # Cosine similarity as a percentage
+        })
+    return results
+
+SEARCH_RESULTS_CACHE_SIZE = 256  # Recent (query, num_results) answers kept per knowledge base
+SEARCH_RESULTS_LOCK = threading.Lock()
+
+def search_knowledge_base(query, knowledge_base, num_results=5):  # Increased to 5 results for better coverage
+    """
+    Search for relevant sections in markdown files and extract the most relevant paragraphs.
+    """
+    # Feedback enhancement removed - not used in current interface
+    
+    index = get_search_index(knowledge_base)
+    if not index['sections']:
+        return []
+    
+    # A question asked again (e.g. regenerated through the streaming endpoint) reuses its ranking;
+    # the cache lives on the index, so a reloaded knowledge base starts empty
+    key = (query, num_results)
+    cache = index['results']
+    with SEARCH_RESULTS_LOCK:
+        results = cache.get(key)
+        if results is not None:
+            cache.move_to_end(key)
+            return list(results)
+    
+    results = rank_sections(query, index, num_results)
+    with SEARCH_RESULTS_LOCK:
+        cache[key] = results
+        while len(cache) > SEARCH_RESULTS_CACHE_SIZE:
+            cache.popitem(last=False)
+    return list(results)
+
+def rank_sections(query, index, num_results):
+    """Score every section of the search index against the query and return the best matches"""
+    query_lower = query.lower()
+    query_words = frozenset(query_lower.split())
+    
+    if SEMANTIC_SEARCH_ENABLED:
+        results = semantic_search_sections(query, index, num_results)
+        if results is not None:
+            return results
+    
+    # High score for filename/folder matches: filenames are matched as one array,
+    # folders once per distinct folder rather than once per document
+    filename_match = np.zeros(len(index['docs']), dtype=bool)
+    for word in query_words:
+        filename_match |= np.char.find(index['filenames'], word) >= 0
+    
+    # One alternation scans each folder name once instead of once per query word
+    query_word_re = re.compile('|'.join(map(re.escape, query_words))) if query_words else None
+    folder_match = np.zeros(len(index['folders']), dtype=bool)
+    folder_bonus = np.zeros(len(index['folders']), dtype=np.float64)
+    for folder_id, folder_lower in enumerate(index['folders']):
+        folder_match[folder_id] = query_word_re is not None and query_word_re.search(folder_lower) is not None
+        # Extra bonus for exact folder name matches (like "QA" folder)
+        if query_lower in folder_lower or folder_lower in query_lower:
+            folder_bonus[folder_id] = 10  # Significant bonus for exact folder matches
+    
+    # Folder matches (12) take priority over filename matches (15), as before
+    doc_scores = np.where(folder_match[index['doc_folders']], 12, np.where(filename_match, 15, 0))
+    doc_scores = doc_scores + folder_bonus[index['doc_folders']]
+    
+    # Relevance score based on query words in each section (header and content)
+    scores = np.zeros(len(index['sections']), dtype=np.float64)
+    header_match = np.zeros(len(index['sections']), dtype=bool)
+    for word in query_words:
+        section_ids = index['postings'].get(word)
+        if section_ids is not None:
+            scores[section_ids] += 1
+        header_match |= np.char.find(index['headers'], word) >= 0
+    
+    scores += header_match * 5  # Higher bonus points for header matches
+    scores += index['length_bonus']
+    scores += doc_scores[index['section_docs']]
+    
+    # Only include sections with matches (including filename matches), best first
+    matches = np.flatnonzero(scores > 0)
+    if 0 < num_results < len(matches):
+        # Only sort the sections scoring at least the k-th best; ties at the cut stay in document order
+        cutoff = np.partition(scores[matches], len(matches) - num_results)[len(matches) - num_results]
+        matches = matches[scores[matches] >= cutoff]
+    top = matches[np.argsort(-scores[matches], kind='stable')[:num_results]]
+    
+    results = []
+    for section_id in top:
+        score = float(scores[section_id])
+        doc, folder_path = index['docs'][index['section_docs'][section_id]]
+        section = index['sections'][section_id]
+        results.append({
+            "score": score,
+            "section": section['content'].strip(),
+            "header": section['header'],
+            "filename": doc['filename'],
+            "folder_path": folder_path,
+            "relevance": round((score / (len(query_words) + 2)) * 100, 2)  # Adjusted for header bonus
+        })
+    return results
 
 # Feedback enhancement functions removed - not used in current interface
 
 # --- 3. Query Ollama with Context ---
-def ask_ollama_with_context(query, context_documents):
-    """Formats a prompt with context and queries Ollama for analysis."""
-    # Combine the content of the context documents
-    context = "\n\n---\n\n".join([doc['content'] for doc in context_documents])
-    
-    print(f"DEBUG: ask_ollama_with_context called")
-    print(f"DEBUG: Query: {query}")
-    print(f"DEBUG: Context length: {len(context)}")
-    print(f"DEBUG: Context preview: {context[:200]}...")
+# Models tried in order of preference when answering with context
+OLLAMA_CONTEXT_MODELS = ["ollama-trained", "mistral-trained", "llama2-trained", "llama2", "mistral"]
+OLLAMA_URL = os.getenv("OLLAMA_BASE_URL", "http://localhost:11434")
+
+# Shared keep-alive session so model fallbacks reuse pooled connections to Ollama
+_SESSION = requests.Session()
+_SESSION.mount('http://', HTTPAdapter(pool_connections=4, pool_maxsize=8))
+_SESSION.mount('https://', HTTPAdapter(pool_connections=4, pool_maxsize=8))
+
+# Installed subset of OLLAMA_CONTEXT_MODELS, refreshed from /api/tags at most once a minute
+_CONTEXT_MODELS = {'models': None, 'checked': 0}
+CONTEXT_MODELS_TTL = 60
+
+def get_context_models():
+    """Return the preferred context models Ollama actually has, so requests skip missing ones"""
+    now = time.time()
+    if _CONTEXT_MODELS['models'] is None or now - _CONTEXT_MODELS['checked'] > CONTEXT_MODELS_TTL:
+        try:
+            response = _SESSION.get(f"{OLLAMA_URL}/api/tags", timeout=5)
+            response.raise_for_status()
+            installed = set()
+            for model in response.json().get('models', []):
+                name = model.get('name', '')
+                installed.add(name)
+                installed.add(name.split(':')[0] if name.endswith(':latest') else name)
+            models = [model for model in OLLAMA_CONTEXT_MODELS if model in installed]
+        except Exception as e:
+            print(f"⚠️  Could not list Ollama models: {e}")
+            models = []
+        # With nothing known to be installed, keep trying the full preference list
+        _CONTEXT_MODELS['models'] = models or OLLAMA_CONTEXT_MODELS
+        _CONTEXT_MODELS['checked'] = now
+    return _CONTEXT_MODELS['models']
+
+AI_ANSWER_TIMEOUT = int(os.getenv("AI_ANSWER_TIMEOUT", "60"))  # seconds before falling back to keyword search
 
-    # Create the prompt for the model
-    prompt = f"""
+CONTEXT_PROMPT_HEADER = """
     You are an AI assistant with access to local knowledge base content.
 
     LOCAL CONTEXT (from knowledge base):
-    {context}
+    """
+
+CONTEXT_PROMPT_FOOTER = """
 
     USER'S QUESTION:
     {query}
@@ -339,38 +727,95 @@ def ask_ollama_with_context(query, context_documents):
     Please provide a detailed, well-structured response that addresses the user's question based on the available local context.
     """
 
+def build_context_prompt(query, context_documents):
+    """Returns the prompt sent to Ollama as a list of pieces, so document content is never copied into one big string."""
+    parts = [CONTEXT_PROMPT_HEADER]
+    for i, doc in enumerate(context_documents):
+        if i:
+            parts.append("\n\n---\n\n")
+        parts.append(doc['content'])
+    parts.append(CONTEXT_PROMPT_FOOTER.format(query=query))
+    
+    context_length = sum(len(part) for part in parts[1:-1])
+    preview = ""
+    for part in parts[1:-1]:
+        if len(preview) >= 200:
+            break
+        preview += part[:200 - len(preview)]
+    print(f"DEBUG: ask_ollama_with_context called")
+    print(f"DEBUG: Query: {query}")
+    print(f"DEBUG: Context length: {context_length}")
+    print(f"DEBUG: Context preview: {preview}...")
+    return parts
+
+def iter_generate_body(model, prompt_parts, stream):
+    """Serialize an /api/generate request body piece by piece for a chunked upload."""
+    keep_alive = OLLAMA_TRAINER.keep_alive_for(model) if OLLAMA_TRAINER else None
+    keep_alive_field = f'"keep_alive": {json.dumps(keep_alive)}, ' if keep_alive is not None else ''
+    yield f'{{"model": {json.dumps(model)}, "stream": {json.dumps(stream)}, {keep_alive_field}"prompt": "'.encode()
+    for part in prompt_parts:
+        # JSON string escaping is per character, so escaping each piece separately is exact
+        yield json.dumps(part)[1:-1].encode()
+    yield b'"}'
+
+CONTEXT_ANSWER_CACHE = OrderedDict()  # Prompt digest -> (answer, timestamp), least recently used first
+CONTEXT_ANSWER_CACHE_SIZE = 256
+CONTEXT_ANSWER_CACHE_TTL = 3600  # 1 hour, same as the Ollama trainer response cache
+CONTEXT_ANSWER_LOCK = threading.Lock()
+
+def prompt_cache_key(prompt_parts):
+    """Digest of the full prompt, hashed piece by piece so the documents are not joined"""
+    digest = hashlib.blake2b(digest_size=16)
+    for part in prompt_parts:
+        digest.update(part.encode('utf-8'))
+        digest.update(b"\0")
+    return digest.hexdigest()
+
+def ask_ollama_with_context(query, context_documents, timeout=120):
+    """Formats a prompt with context and queries Ollama for analysis.
+
+    Raises requests.exceptions.Timeout when no model has answered within `timeout` seconds.
+    """
+    prompt_parts = build_context_prompt(query, context_documents)
+
     print("\n--- Asking Ollama with Context ---")
     
-    # Try models in order of preference
-    models_to_try = ["ollama-trained", "mistral-trained", "llama2-trained", "llama2", "mistral"]
+    # The same question over the same documents is answered from memory
+    cache_key = prompt_cache_key(prompt_parts)
+    with CONTEXT_ANSWER_LOCK:
+        cached = CONTEXT_ANSWER_CACHE.get(cache_key)
+        if cached is not None and time.time() - cached[1] < CONTEXT_ANSWER_CACHE_TTL:
+            CONTEXT_ANSWER_CACHE.move_to_end(cache_key)
+            print("🚀 Using cached answer for identical prompt")
+            return cached[0]
     
-    for model in models_to_try:
+    # Try installed models in order of preference, all within one deadline
+    deadline = time.monotonic() + timeout
+    for model in get_context_models():
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            raise requests.exceptions.Timeout(f"No answer from Ollama within {timeout}s")
         try:
-            import requests
-            import json
-            
             print(f"🔄 Trying model: {model}")
             
-            # Prepare the request data for Ollama API
-            request_data = {
-                "model": model,
-                "prompt": prompt,
-                "stream": False
-            }
-            
-            # Make request to Ollama
-            ollama_url = os.getenv("OLLAMA_BASE_URL", "http://localhost:11434")
-            response = requests.post(
-                f"{ollama_url}/api/generate",
-                json=request_data,
+            # Stream the request body to Ollama instead of building the full JSON payload
+            response = _SESSION.post(
+                f"{OLLAMA_URL}/api/generate",
+                data=iter_generate_body(model, prompt_parts, False),
                 headers={"Content-Type": "application/json"},
-                timeout=120
+                timeout=remaining
             )
             
             if response.status_code == 200:
-                result = response.json()
+                result = app.json.loads(response.content)
                 response_text = result.get("response", "No response from Ollama")
                 print(f"✅ Successfully used model: {model}")
+                if "response" in result:
+                    with CONTEXT_ANSWER_LOCK:
+                        CONTEXT_ANSWER_CACHE[cache_key] = (response_text, time.time())
+                        CONTEXT_ANSWER_CACHE.move_to_end(cache_key)
+                        while len(CONTEXT_ANSWER_CACHE) > CONTEXT_ANSWER_CACHE_SIZE:
+                            CONTEXT_ANSWER_CACHE.popitem(last=False)
                 return response_text
             else:
                 error_data = response.json() if response.content else {}
@@ -385,6 +830,9 @@ def ask_ollama_with_context(query, context_documents):
                     # For other errors, continue to next model
                     continue
         
+        except requests.exceptions.Timeout:
+            # Dropping the connection also stops Ollama generating for it
+            raise
         except Exception as e:
             print(f"❌ Exception with model {model}: {e}")
             # Continue to next model
@@ -394,16 +842,133 @@ def ask_ollama_with_context(query, context_documents):
     print("❌ All models failed")
     return "Error: Unable to get response from any Ollama model. Please check if Ollama is running and has available models."
 
+def stream_ollama_with_context(query, context_documents):
+    """Formats a prompt with context and streams Ollama's NDJSON response lines as they arrive."""
+    prompt_parts = build_context_prompt(query, context_documents)
+
+    print("\n--- Streaming Ollama with Context ---")
+    
+    # Fall through to the next model only while nothing has been sent to the client
+    for model in get_context_models():
+        started = False
+        try:
+            print(f"🔄 Trying model: {model}")
+            with _SESSION.post(
+                f"{OLLAMA_URL}/api/generate",
+                data=iter_generate_body(model, prompt_parts, True),
+                headers={"Content-Type": "application/json"},
+                timeout=120,
+                stream=True
+            ) as response:
+                if response.status_code != 200:
+                    error_data = response.json() if response.content else {}
+                    print(f"❌ Model {model} failed: {error_data.get('error', f'HTTP {response.status_code}')}")
+                    continue
+                
+                print(f"✅ Streaming from model: {model}")
+                for line in response.iter_lines():
+                    if line:
+                        started = True
+                        yield line + b"\n"
+                return
+        
+        except Exception as e:
+            print(f"❌ Exception with model {model}: {e}")
+            if started:
+                yield json.dumps({"error": f"Stream from {model} interrupted: {e}", "done": True}).encode() + b"\n"
+                return
+            continue
+    
+    print("❌ All models failed")
+    yield json.dumps({"error": "Unable to get response from any Ollama model. Please check if Ollama is running and has available models.", "done": True}).encode() + b"\n"
+
+def join_context_sections(relevant_docs):
+    """Join the result sections into prompt context, skipping duplicates shared by copied documents"""
+    return "\n\n---\n\n".join(dict.fromkeys(doc['section'] for doc in relevant_docs))
+
+def format_sources(relevant_docs):
+    """Shape search results into the source records returned to the client"""
+    return [{
+        'filename': doc['filename'],
+        'folder_path': doc['folder_path'],
+        'relevance': doc['relevance'],
+        'header': doc['header'] if doc['header'] else 'No header',
+        'content': doc['section'],
+        'full_document_available': True
+    } for doc in relevant_docs]
+
+def format_search_answer(relevant_docs, heading):
+    """Format top search results as a plain-text answer, showing each section's folder/file location"""
+    parts = [heading]
+    for i, doc in enumerate(relevant_docs):
+        if i:
+            parts.append("\n\n")
+        if doc['folder_path'] == 'root':
+            parts.append(f"From {doc['filename']}")
+        else:
+            parts.append(f"From {doc['folder_path']}/{doc['filename'].split('/')[-1]}")
+        parts.append(":\n")
+        parts.append(doc['section'])
+    # Single join at the end instead of building an intermediate string per document
+    return "".join(parts)
+
+def local_search_answer(query):
+    """Answer and sources from the top keyword search matches, used when the model is too slow to respond."""
+    relevant_docs = search_knowledge_base(query, kb, num_results=2)
+    if not relevant_docs:
+        return "I couldn't find any relevant information in the local knowledge base.", []
+    
+    answer = format_search_answer(relevant_docs, "Based on the local knowledge base:\n\n")
+    return answer, format_sources(relevant_docs)
+
 # --- Flask Web Server Setup ---
-from flask import Flask, request, jsonify, Response, send_file
+from flask import Flask, request, jsonify, Response, send_file, stream_with_context
 from flask_cors import CORS
 import tempfile
 import os
 from werkzeug.utils import secure_filename
+from flask.json.provider import DefaultJSONProvider
+
+# Fast JSON encoding/decoding for API responses when orjson is installed
+try:
+    import orjson
+    ORJSON_AVAILABLE = True
+except ImportError:
+    ORJSON_AVAILABLE = False
+
+class ORJSONProvider(DefaultJSONProvider):
+    """Flask JSON provider backed by orjson, keeping Flask's fallbacks for other types"""
+    
+    def dumps(self, obj, **kwargs):
+        option = orjson.OPT_NON_STR_KEYS | orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_PASSTHROUGH_DATETIME
+        if kwargs.get('sort_keys', self.sort_keys):
+            option |= orjson.OPT_SORT_KEYS
+        if kwargs.get('indent'):
+            option |= orjson.OPT_INDENT_2
+        return orjson.dumps(obj, default=self.default, option=option).decode('utf-8')
+    
+    def loads(self, s, **kwargs):
+        return orjson.loads(s)
 
 app = Flask(__name__)
+if ORJSON_AVAILABLE:
+    app.json = ORJSONProvider(app)
 CORS(app)
 
+# Stop proxies such as nginx from holding streamed events back in their buffers
+SSE_HEADERS = {
+    'Cache-Control': 'no-cache',
+    'Connection': 'keep-alive',
+    'X-Accel-Buffering': 'no'
+}
+
+def sse_event(payload):
+    """Encode one server-sent event with the app's JSON provider, escaping any token text"""
+    return b"data: " + app.json.dumps(payload).encode('utf-8') + b"\n\n"
+
+# Every stream ends with the same event, so it is encoded once
+SSE_DONE_EVENT = sse_event({"done": True})
+
 # Load knowledge base at startup
 reload_knowledge_base()
 
@@ -412,12 +977,12 @@ def status():
     """Get system status"""
     status_data = {
         'status': 'running',
-        'documents_loaded': reload_knowledge_base(),
+        'documents_loaded': len(kb),
         'knowledge_base_documents': len(kb),
 
         'ollama_available': OLLAMA_AVAILABLE,
         'feedback_available': FEEDBACK_AVAILABLE,
-        'personality_loaded': bool(PERSONALITY_PROMPT),
+        'personality_loaded': bool(get_personality_prompt()),
         'model_preloaded': MODEL_PRELOADED
     }
     
@@ -468,24 +1033,9 @@ def ask():
             steps.append(f"Found {len(relevant_docs)} relevant document sections")
             
             # Format the answer to show folder structure clearly
-            answer_parts = []
-            for doc in relevant_docs[:2]:
-                if doc['folder_path'] == 'root':
-                    location = f"From {doc['filename']}"
-                else:
-                    location = f"From {doc['folder_path']}/{doc['filename'].split('/')[-1]}"
-                answer_parts.append(f"{location}:\n{doc['section']}")
-            
-            answer = "Based on the local knowledge base:\n\n" + "\n\n".join(answer_parts)
+            answer = format_search_answer(relevant_docs[:2], "Based on the local knowledge base:\n\n")
             
-            sources = [{
-                'filename': doc['filename'],
-                'folder_path': doc['folder_path'],
-                'relevance': doc['relevance'],
-                'header': doc['header'] if doc['header'] else 'No header',
-                'content': doc['section'],
-                'full_document_available': True
-            } for doc in relevant_docs]
+            sources = format_sources(relevant_docs)
 
             return jsonify({
                 'answer': answer,
@@ -614,37 +1164,100 @@ def ask():
         context_docs = []
         if files_to_include:
             for filename in files_to_include:
-                try:
-                    # Find the file in the knowledge base to get its full path
-                    file_doc = next((doc for doc in kb if doc['filename'] == filename), None)
-                    if file_doc:
-                        # Use the full_path from the knowledge base
-                        file_path = file_doc['full_path']
-                        print(f"DEBUG: Reading file: {file_path}")
-                        with open(file_path, 'r', encoding='utf-8') as f:
-                            content = f.read()
-                            print(f"DEBUG: File {filename} content length: {len(content)}")
-                            context_docs.append({"content": content})
-                    else:
-                        print(f"DEBUG: File {filename} not found in knowledge base")
-                        steps.append(f"File {filename} not found in knowledge base")
-                except Exception as e:
-                    print(f"Error reading file {filename}: {e}")
-                    steps.append(f"Error reading file {filename}: {e}")
+                # The loaded document already holds the file's content, so nothing is re-read from disk
+                file_doc = KB_BY_NAME.get(filename)
+                if file_doc:
+                    print(f"DEBUG: File {filename} content length: {len(file_doc['content'])}")
+                    context_docs.append(file_doc)
+                else:
+                    print(f"DEBUG: File {filename} not found in knowledge base")
+                    steps.append(f"File {filename} not found in knowledge base")
         else:
             print("DEBUG: No files to include")
         
         print(f"DEBUG: Context docs count: {len(context_docs)}")
-        
+
+        sources = [{'filename': f, 'content': 'Included in AI analysis'} for f in files_to_include]
+
+        # Check the semantic cache for an answer to a similar question over the same files
+        cache_scope = "\n".join(files_to_include)
+        cache_embedding = None
+        if SEMANTIC_CACHE_ENABLED:
+            try:
+                cached, cache_embedding = semantic_cache.lookup(message_to_send, cache_scope)
+                if cached:
+                    steps.append("Answer served from semantic cache")
+                    if data.get('stream'):
+                        lines = [
+                            {'steps': steps, 'sources': cached['sources']},
+                            {'response': cached['response'], 'done': True, 'cached': True}
+                        ]
+                        return Response(b"".join(app.json.dumps(line).encode() + b"\n" for line in lines),
+                                        mimetype='application/x-ndjson')
+                    return jsonify({
+                        'answer': cached['response'],
+                        'next_step': None,
+                        'steps': steps,
+                        'sources': cached['sources'],
+                        'cached': True
+                    })
+            except Exception as e:
+                print(f"⚠️ Semantic cache lookup failed: {e}")
+
         steps.append("Processing request with AI...")
-        answer = ask_ollama_with_context(message_to_send, context_docs)
-        steps.append("AI response received")
-        
+
+        if data.get('stream'):
+            # Stream Ollama's NDJSON lines as they are generated, after a metadata line
+            def generate():
+                yield app.json.dumps({'steps': steps, 'sources': sources}).encode() + b"\n"
+                answer_parts = []
+                completed = False
+                for line in stream_ollama_with_context(message_to_send, context_docs):
+                    try:
+                        chunk = app.json.loads(line)
+                    except ValueError:
+                        yield line
+                        continue
+                    answer_parts.append(chunk.get('response', ''))
+                    if 'error' in chunk:
+                        completed = False
+                    elif chunk.get('done'):
+                        completed = True
+                        if 'context' in chunk:
+                            # The final line carries the whole prompt's token ids, which the client never uses
+                            chunk.pop('context')
+                            line = app.json.dumps(chunk).encode() + b"\n"
+                    yield line
+                # Only a stream Ollama finished is a complete answer worth caching
+                if cache_embedding is not None and completed:
+                    semantic_cache.store(cache_embedding, message_to_send, "".join(answer_parts), sources, cache_scope)
+
+            return Response(stream_with_context(generate()), mimetype='application/x-ndjson')
+
+        try:
+            answer = ask_ollama_with_context(message_to_send, context_docs, timeout=AI_ANSWER_TIMEOUT)
+            steps.append("AI response received")
+        except requests.exceptions.Timeout:
+            # Answer from the knowledge base instead
+            print(f"⏱️ AI response took longer than {AI_ANSWER_TIMEOUT}s, falling back to keyword search")
+            steps.append(f"AI response timed out after {AI_ANSWER_TIMEOUT}s, using knowledge base search instead")
+            answer, fallback_sources = local_search_answer(message_to_send)
+            return jsonify({
+                'answer': answer,
+                'next_step': None,
+                'steps': steps,
+                'sources': fallback_sources,
+                'method': 'simple_fallback'
+            })
+
+        if cache_embedding is not None and not answer.startswith("Error:"):
+            semantic_cache.store(cache_embedding, message_to_send, answer, sources, cache_scope)
+
         return jsonify({
             'answer': answer,
             'next_step': None,
             'steps': steps,
-            'sources': [{'filename': f, 'content': 'Included in AI analysis'} for f in files_to_include]
+            'sources': sources
         })
     
     return jsonify({'error': 'Invalid step'}), 400
@@ -696,16 +1309,15 @@ def get_document(filename):
                     return jsonify({'error': f'Document not found: {filename}'}), 404
         else:
             # Fallback to vector search knowledge base
-            file_doc = next((doc for doc in kb if doc['filename'] == filename), None)
+            file_doc = KB_BY_NAME.get(filename)
             if file_doc:
                 # Use the full_path from the knowledge base
                 file_path = file_doc['full_path']
-                with open(file_path, 'r', encoding='utf-8') as f:
-                    content = f.read()
-                    return jsonify({
-                        'filename': filename,
-                        'content': content
-                    })
+                content = read_markdown_file(file_path)
+                return jsonify({
+                    'filename': filename,
+                    'content': content
+                })
             else:
                 return jsonify({'error': 'Document not found'}), 404
     except Exception as e:
@@ -726,6 +1338,10 @@ def get_document(filename):
 @app.route('/ask-ollama', methods=['POST'])
 def ask_ollama():
     """Ask question using Ollama with knowledge base context"""
+    # Clients that explicitly accept server-sent events get tokens as they are generated
+    if 'text/event-stream' in request.headers.get('Accept', ''):
+        return ask_ollama_stream()
+
     if not OLLAMA_AVAILABLE:
         return jsonify({
             'error': 'Ollama trainer not available'
@@ -742,6 +1358,24 @@ def ask_ollama():
 
     user_question = data['question']
     
+    # Answers depend on the active personality, so each behavior file gets its own cache scope
+    cache_scope = f"ask-ollama:{PERSONALITY_STATE['filename']}"
+    cache_embedding = None
+    if SEMANTIC_CACHE_ENABLED:
+        try:
+            cached, cache_embedding = semantic_cache.lookup(user_question, cache_scope)
+            if cached:
+                return jsonify({
+                    'answer': cached['response'],
+                    'sources': cached['sources'],
+                    'method': 'semantic_cache',
+                    'ai_used': True,
+                    'fallback_used': False,
+                    'cached': True
+                })
+        except Exception as e:
+            print(f"⚠️ Semantic cache lookup failed: {e}")
+    
     try:
         # Search knowledge base for relevant context
         relevant_docs = search_knowledge_base(user_question, kb, num_results=3)
@@ -754,31 +1388,18 @@ def ask_ollama():
             })
         
         # Prepare context from relevant documents
-        context = "\n\n---\n\n".join([doc['section'] for doc in relevant_docs])
+        context = join_context_sections(relevant_docs)
         
-        # Query Ollama with context
-        global OLLAMA_TRAINER
+        # Format sources once for either answer
+        sources = format_sources(relevant_docs)
         
-        if OLLAMA_TRAINER:
-            ollama_response = OLLAMA_TRAINER.query_ollama(user_question, context)
-        else:
-            # Fallback to creating a new instance
-            ollama_url = os.getenv("OLLAMA_BASE_URL", "http://localhost:11434")
-            ollama_trainer = OllamaTrainer(ollama_url)
-            ollama_response = ollama_trainer.query_ollama(user_question, context)
+        # Query Ollama with context
+        ollama_response = get_ollama_trainer().query_ollama(user_question, context)
         
         if ollama_response:
             print("✅ Ollama query successful - using AI-generated response")
-            # Format sources
-            sources = [{
-                'filename': doc['filename'],
-                'folder_path': doc['folder_path'],
-                'relevance': doc['relevance'],
-                'header': doc['header'] if doc['header'] else 'No header',
-                'content': doc['section'],
-                'full_document_available': True
-            } for doc in relevant_docs]
-            
+            if cache_embedding is not None:
+                semantic_cache.store(cache_embedding, user_question, ollama_response, sources, cache_scope)
             return jsonify({
                 'answer': ollama_response,
                 'sources': sources,
@@ -789,24 +1410,7 @@ def ask_ollama():
         else:
             print("⚠️  Ollama query failed - falling back to local search")
             # Fallback to simple search if Ollama fails
-            answer_parts = []
-            for doc in relevant_docs[:2]:
-                if doc['folder_path'] == 'root':
-                    location = f"From {doc['filename']}"
-                else:
-                    location = f"From {doc['folder_path']}/{doc['filename'].split('/')[-1]}"
-                answer_parts.append(f"{location}:\n{doc['section']}")
-            
-            answer = "Based on the knowledge base:\n\n" + "\n\n".join(answer_parts)
-            
-            sources = [{
-                'filename': doc['filename'],
-                'folder_path': doc['folder_path'],
-                'relevance': doc['relevance'],
-                'header': doc['header'] if doc['header'] else 'No header',
-                'content': doc['section'],
-                'full_document_available': True
-            } for doc in relevant_docs]
+            answer = format_search_answer(relevant_docs[:2], "Based on the knowledge base:\n\n")
             
             return jsonify({
                 'answer': answer,
@@ -848,42 +1452,26 @@ def ask_ollama_stream():
             relevant_docs = search_knowledge_base(user_question, kb, num_results=3)
             
             if not relevant_docs:
-                yield f"data: {{\"error\": \"I couldn't find any relevant information in the knowledge base for your question.\"}}\n\n"
+                yield sse_event({"error": "I couldn't find any relevant information in the knowledge base for your question."})
                 return
             
             # Prepare context from relevant documents
-            context = "\n\n---\n\n".join([doc['section'] for doc in relevant_docs])
+            context = join_context_sections(relevant_docs)
             
             # Send sources info first
-            sources = [{
-                'filename': doc['filename'],
-                'folder_path': doc['folder_path'],
-                'relevance': doc['relevance'],
-                'header': doc['header'] if doc['header'] else 'No header',
-                'content': doc['section'],
-                'full_document_available': True
-            } for doc in relevant_docs]
+            sources = format_sources(relevant_docs)
             
-            yield f"data: {{\"sources\": {json.dumps(sources)}}}\n\n"
+            yield sse_event({"sources": sources})
             
             # Query Ollama with streaming
-            global OLLAMA_TRAINER
-            
-            if OLLAMA_TRAINER:
-                for chunk in OLLAMA_TRAINER.query_ollama_stream(user_question, context):
-                    yield chunk
-            else:
-                # Fallback to creating a new instance
-                ollama_url = os.getenv("OLLAMA_BASE_URL", "http://localhost:11434")
-                ollama_trainer = OllamaTrainer(ollama_url)
-                for chunk in ollama_trainer.query_ollama_stream(user_question, context):
-                    yield chunk
+            for chunk in get_ollama_trainer().query_ollama_stream(user_question, context):
+                yield chunk
                     
         except Exception as e:
             print(f"Error in streaming Ollama query: {e}")
-            yield f"data: {{\"error\": \"Error processing streaming Ollama query: {str(e)}\"}}\n\n"
+            yield sse_event({"error": f"Error processing streaming Ollama query: {str(e)}"})
     
-    return Response(generate(), mimetype='text/plain')
+    return Response(generate(), mimetype='text/event-stream', headers=SSE_HEADERS)
 
 @app.route('/train-ollama', methods=['POST'])
 def train_ollama():
@@ -926,16 +1514,14 @@ def train_ollama():
         behavior_filename = data.get('behavior_filename', 'behavior.md')
         
         # Validate custom name (alphanumeric, hyphens, underscores only)
-        import re
         if not re.match(r'^[a-zA-Z0-9_-]+$', custom_name):
             return jsonify({
                 'success': False,
                 'error': 'Custom name can only contain letters, numbers, hyphens, and underscores.'
             }), 400
         
-        # Initialize Ollama trainer
-        ollama_url = os.getenv("OLLAMA_BASE_URL", "http://localhost:11434")
-        ollama_trainer = OllamaTrainer(ollama_url)
+        # Use the shared Ollama trainer
+        ollama_trainer = get_ollama_trainer()
         
         # Train the model with selected files, custom name, and behavior
         result = ollama_trainer.train_with_custom_selection(
@@ -985,19 +1571,22 @@ def get_knowledge_base_structure():
                 'message': 'Knowledge base directory not found'
             })
         
-        def scan_directory(path, base_path):
+        def scan_directory(path, relative_dir=""):
             items = []
             try:
-                for item in sorted(os.listdir(path)):
+                # DirEntry caches the file type from the directory read, saving a stat per entry
+                with os.scandir(path) as it:
+                    entries = sorted(it, key=lambda entry: entry.name)
+                for entry in entries:
+                    item = entry.name
                     if item.startswith('.'):
                         continue
                     
-                    item_path = os.path.join(path, item)
-                    relative_path = os.path.relpath(item_path, base_path)
+                    relative_path = os.path.join(relative_dir, item) if relative_dir else item
                     
-                    if os.path.isdir(item_path):
+                    if entry.is_dir():
                         # Directory
-                        children = scan_directory(item_path, base_path)
+                        children = scan_directory(entry.path, relative_path)
                         items.append({
                             'name': item,
                             'type': 'directory',
@@ -1008,7 +1597,7 @@ def get_knowledge_base_structure():
                     elif item.endswith('.md'):
                         # Markdown file
                         try:
-                            stat = os.stat(item_path)
+                            stat = entry.stat()
                             size = stat.st_size
                             modified = datetime.fromtimestamp(stat.st_mtime).isoformat()
                             
@@ -1026,7 +1615,7 @@ def get_knowledge_base_structure():
             
             return items
         
-        structure = scan_directory(knowledge_base_path, knowledge_base_path)
+        structure = scan_directory(knowledge_base_path)
         
         total_files = 0
         def count_files(items):
@@ -1052,6 +1641,20 @@ def get_knowledge_base_structure():
             'error': str(e)
         }), 500
 
+# Pre-serialized bodies for polled endpoints: (key, body, etag), rebuilt only when the key changes
+_JSON_RESPONSE_CACHE = {}
+
+def cached_json_response(name, key, build):
+    """Serve a cached JSON body with an ETag, answering a matching If-None-Match with 304"""
+    entry = _JSON_RESPONSE_CACHE.get(name)
+    if entry is None or entry[0] != key:
+        body = app.json.dumps(build()).encode('utf-8') + b"\n"
+        entry = (key, body, hashlib.blake2b(body, digest_size=8).hexdigest())
+        _JSON_RESPONSE_CACHE[name] = entry
+    response = Response(entry[1], mimetype='application/json')
+    response.set_etag(entry[2])
+    return response.make_conditional(request)
+
 @app.route('/performance', methods=['GET'])
 def get_performance_stats():
     """Get performance statistics"""
@@ -1062,17 +1665,25 @@ def get_performance_stats():
         "model_preloaded": MODEL_PRELOADED,
         "cache_size": len(OLLAMA_TRAINER.response_cache) if OLLAMA_TRAINER else 0,
         "cache_hits": getattr(OLLAMA_TRAINER, 'cache_hits', 0) if OLLAMA_TRAINER else 0,
-        "cache_misses": getattr(OLLAMA_TRAINER, 'cache_misses', 0) if OLLAMA_TRAINER else 0
+        "cache_misses": getattr(OLLAMA_TRAINER, 'cache_misses', 0) if OLLAMA_TRAINER else 0,
+        "semantic_cache": semantic_cache.get_stats() if SEMANTIC_CACHE_ENABLED else None
     }
     
-    return jsonify(stats)
+    # The counters rarely move between polls, so the encoded body is usually reused
+    return cached_json_response('performance', stats, lambda: stats)
 
 @app.route('/personality', methods=['GET'])
 def get_personality():
     """Get current personality prompt"""
-    return jsonify({
-        'personality_prompt': get_personality_prompt(),
-        'has_behavior_file': os.path.exists('/app/behavior_model/behavior.md'),
+    personality_prompt = get_personality_prompt()
+    if PERSONALITY_STATE['filename'] == "behavior.md":
+        # Known from the last (throttled) stat of the active behavior file
+        has_behavior_file = PERSONALITY_STATE['mtime'] is not None
+    else:
+        has_behavior_file = os.path.exists('/app/behavior_model/behavior.md')
+    return cached_json_response('personality', (personality_prompt, has_behavior_file), lambda: {
+        'personality_prompt': personality_prompt,
+        'has_behavior_file': has_behavior_file,
         'behavior_file_path': '/app/behavior_model/behavior.md'
     })
 
@@ -1093,6 +1704,40 @@ def reload_personality():
             'error': f'Failed to reload personality: {str(e)}'
         }), 500
 
+@lru_cache(maxsize=64)
+def summarize_behavior_file(filepath, filename, mtime_ns):
+    """Build the listing entry for a behavior file; cached until the file's mtime changes"""
+    with open(filepath, 'r', encoding='utf-8') as f:
+        content = f.read()
+        
+    # Extract name from first header or use filename
+    lines = content.split('\n')
+    name = filename.replace('.md', '').replace('_', ' ').replace('-', ' ').title()
+    description = "Custom behavior profile"
+    preview = ""
+    
+    for line in lines:
+        if line.startswith('# '):
+            name = line[2:].strip()
+            if ' - ' in name:
+                parts = name.split(' - ', 1)
+                name = parts[1]
+                description = f"{parts[0]} behavior"
+            break
+    
+    # Get a preview from the content
+    for line in lines:
+        if line.strip() and not line.startswith('#') and not line.startswith('##'):
+            preview = line.strip()[:100] + "..." if len(line.strip()) > 100 else line.strip()
+            break
+    
+    return {
+        'name': name,
+        'filename': filename,
+        'description': description,
+        'preview': preview
+    }
+
 @app.route('/behaviors', methods=['GET'])
 def get_behaviors():
     """Get list of available behavior files"""
@@ -1105,37 +1750,8 @@ def get_behaviors():
                 if filename.endswith('.md'):
                     filepath = os.path.join(behavior_dir, filename)
                     try:
-                        with open(filepath, 'r', encoding='utf-8') as f:
-                            content = f.read()
-                            
-                        # Extract name from first header or use filename
-                        lines = content.split('\n')
-                        name = filename.replace('.md', '').replace('_', ' ').replace('-', ' ').title()
-                        description = "Custom behavior profile"
-                        preview = ""
-                        
-                        for line in lines:
-                            if line.startswith('# '):
-                                name = line[2:].strip()
-                                if ' - ' in name:
-                                    parts = name.split(' - ', 1)
-                                    name = parts[1]
-                                    description = f"{parts[0]} behavior"
-                                break
-                        
-                        # Get a preview from the content
-                        for line in lines:
-                            if line.strip() and not line.startswith('#') and not line.startswith('##'):
-                                preview = line.strip()[:100] + "..." if len(line.strip()) > 100 else line.strip()
-                                break
-                        
-                        behaviors.append({
-                            'name': name,
-                            'filename': filename,
-                            'description': description,
-                            'preview': preview
-                        })
-                        
+                        mtime_ns = os.stat(filepath).st_mtime_ns
+                        behaviors.append(summarize_behavior_file(filepath, filename, mtime_ns))
                     except Exception as e:
                         print(f"Error reading behavior file {filename}: {e}")
                         
@@ -1184,6 +1800,9 @@ def reload_knowledge_base_endpoint():
     """Reload knowledge base from disk"""
     try:
         document_count = reload_knowledge_base()
+        # Cached answers may reference content that just changed
+        if SEMANTIC_CACHE_ENABLED:
+            semantic_cache.clear()
         return jsonify({
             'success': True,
             'message': f'Knowledge base reloaded successfully with {document_count} documents',
@@ -1280,6 +1899,8 @@ def select_model():
         success = model_manager.set_selected_model(model_name)
         
         if success:
+            # The next question will use this model, so start loading it while the user types
+            warm_model_in_background(model_name)
             return jsonify({
                 'success': True,
                 'selected_model': model_name,
@@ -1460,9 +2081,6 @@ def cleanup_orphaned_files():
         }), 500
     
     try:
-        import os
-        from pathlib import Path
-        
         local_models_dir = "/app/local_models"
         if not os.path.exists(local_models_dir):
             return jsonify({
@@ -1564,6 +2182,27 @@ def cleanup_orphaned_files():
 
 
 
+# Phrases in a question that add fixed search terms, matched in a single pass
+_SEARCH_TRIGGER_RE = re.compile(r"(?P<name>viki|vicki|vicky)|(?P<latest>last|latest)|(?P<note>note)|(?P<mention>mention|talk about)", re.IGNORECASE)
+_SEARCH_TRIGGER_TERMS = [
+    ('name', ['viki', 'vicki', 'vicky']),
+    ('latest', ['latest']),
+    ('note', ['note']),
+    ('mention', ['mention'])
+]
+
+# Common stop words filtered out of questions when extracting search terms
+_STOP_WORDS = frozenset({
+    'what', 'when', 'where', 'which', 'about', 'with', 'from', 'they', 'have', 'were', 
+    'will', 'this', 'that', 'find', 'show', 'tell', 'give', 'help', 'does', 'do', 'is', 
+    'are', 'was', 'were', 'be', 'been', 'being', 'the', 'a', 'an', 'and', 'or', 'but', 
+    'in', 'on', 'at', 'to', 'for', 'of', 'by', 'with', 'without', 'up', 'down', 'out', 
+    'off', 'over', 'under', 'again', 'further', 'then', 'once', 'here', 'there', 'when', 
+    'where', 'why', 'how', 'all', 'any', 'both', 'each', 'few', 'more', 'most', 'other', 
+    'some', 'such', 'no', 'nor', 'not', 'only', 'own', 'same', 'so', 'than', 'too', 
+    'very', 'can', 'will', 'just', 'should', 'now'
+})
+
 @app.route('/query-with-model-stream', methods=['POST'])
 def query_with_model_stream():
     """Stream query with selected model and optional file inclusion"""
@@ -1585,6 +2224,13 @@ def query_with_model_stream():
             # Set model if specified
             if model_name:
                 model_manager.set_selected_model(model_name)
+            selected_model = model_manager.get_selected_model()
+            
+            # Send initial metadata (without sources) before searching, so the client hears back at once
+            yield sse_event({"model_used": selected_model, "include_files": include_files})
+            
+            # Load a cold model in the background while the knowledge base is searched
+            warm_model_in_background(selected_model)
             
             # Get conversation context
             conversation_context = get_conversation_context()
@@ -1600,39 +2246,26 @@ def query_with_model_stream():
                 # First, let's do a smart search to find relevant files based on the user's question
                 # Extract key search terms from the question
                 search_terms = []
-                question_lower = question.lower()
                 
-                # Common patterns for different types of queries
-                if any(word in question_lower for word in ['viki', 'vicki', 'vicky']):
-                    search_terms.extend(['viki', 'vicki', 'vicky'])
-                if 'last' in question_lower or 'latest' in question_lower:
-                    search_terms.append('latest')
-                if 'note' in question_lower or 'notes' in question_lower:
-                    search_terms.append('note')
-                if 'mention' in question_lower or 'talk about' in question_lower:
-                    search_terms.append('mention')
+                # Common patterns for different types of queries (case-insensitive, no lowercased copy)
+                triggered = {match.lastgroup for match in _SEARCH_TRIGGER_RE.finditer(question)}
+                for group, terms in _SEARCH_TRIGGER_TERMS:
+                    if group in triggered:
+                        search_terms.extend(terms)
                 
                 # If no specific terms found, use intelligent term extraction
                 if not search_terms:
                     # Extract meaningful words from the question, filtering out common stop words
-                    stop_words = {
-                        'what', 'when', 'where', 'which', 'about', 'with', 'from', 'they', 'have', 'were', 
-                        'will', 'this', 'that', 'find', 'show', 'tell', 'give', 'help', 'does', 'do', 'is', 
-                        'are', 'was', 'were', 'be', 'been', 'being', 'the', 'a', 'an', 'and', 'or', 'but', 
-                        'in', 'on', 'at', 'to', 'for', 'of', 'by', 'with', 'without', 'up', 'down', 'out', 
-                        'off', 'over', 'under', 'again', 'further', 'then', 'once', 'here', 'there', 'when', 
-                        'where', 'why', 'how', 'all', 'any', 'both', 'each', 'few', 'more', 'most', 'other', 
-                        'some', 'such', 'no', 'nor', 'not', 'only', 'own', 'same', 'so', 'than', 'too', 
-                        'very', 'can', 'will', 'just', 'should', 'now'
-                    }
-                    
                     words = question.split()
                     # Extract meaningful words: longer than 2 chars, not stop words, and not punctuation
                     meaningful_words = []
+                    original_words = {}  # Lowercased word -> first original spelling
                     for word in words:
-                        word_clean = word.lower().strip('.,?!;:')
+                        word_lower = word.lower()
+                        original_words.setdefault(word_lower, word)
+                        word_clean = word_lower.strip('.,?!;:')
                         if (len(word_clean) > 2 and 
-                            word_clean not in stop_words and 
+                            word_clean not in _STOP_WORDS and 
                             not word_clean.isdigit() and
                             not word_clean.startswith("'")):
                             meaningful_words.append(word_clean)
@@ -1643,7 +2276,7 @@ def query_with_model_stream():
                     
                     for word in meaningful_words:
                         # Check if it looks like a name (capitalized in original question)
-                        original_word = next((w for w in words if w.lower() == word), word)
+                        original_word = original_words.get(word, word)
                         if original_word[0].isupper() and len(word) > 2:
                             priority_terms.insert(0, word)  # Names get highest priority
                         else:
@@ -1862,7 +2495,7 @@ def query_with_model_stream():
                 print("⚠️ File tools not available, falling back to vector search")
                 search_results = search_knowledge_base(question, kb, num_results=5)
                 if search_results:
-                    context = "\n\n---\n\n".join([doc['section'] for doc in search_results])
+                    context = join_context_sections(search_results)
                     sources = [{
                         'filename': doc['filename'],
                         'folder_path': doc['folder_path'],
@@ -1875,9 +2508,6 @@ def query_with_model_stream():
                     context = "No relevant files found in knowledge base."
                     sources = []
             
-            # Send initial metadata (without sources)
-            yield f"data: {{\"model_used\": \"{model_manager.get_selected_model()}\", \"include_files\": {json.dumps(include_files)}}}\n\n"
-            
             # Stream the response
             response_obj = model_manager.query_with_selected_model(
                 prompt=question,
@@ -1892,22 +2522,30 @@ def query_with_model_stream():
                 # Process Ollama's streaming response
                 response_count = 0
                 full_response = ""
+                batcher = TokenBatcher()
                 for line in response_obj.iter_lines():
-                    if line:
-                        line_str = line.decode('utf-8')
+                    if not line:
+                        # Lines without a token still give a held batch the chance to go out on time
+                        batch = batcher.poll()
+                        if batch:
+                            yield sse_event({"response": batch})
+                    else:
                         try:
-                            data = json.loads(line_str)
+                            data = app.json.loads(line)
                             
                             # Handle Ollama's streaming format
+                            batch = batcher.add(data['response']) if 'response' in data else batcher.poll()
+                            if batch:
+                                yield sse_event({"response": batch})
                             if 'response' in data:
-                                # Escape any quotes in the response text
-                                response_text = data['response'].replace('"', '\\"').replace('\n', '\\n')
-                                yield f"data: {{\"response\": \"{response_text}\"}}\n\n"
                                 full_response += data['response']
                                 response_count += 1
                             
                             # Check if done - break out of the loop when done
                             if data.get('done', False):
+                                batch = batcher.flush()
+                                if batch:
+                                    yield sse_event({"response": batch})
                                 print(f"✅ Streaming completed with {response_count} response chunks")
                                 # Add to conversation history
                                 add_to_conversation_history(question, full_response)
@@ -1928,41 +2566,44 @@ def query_with_model_stream():
                                 
                                 # Only send the sources that the AI actually referenced
                                 if referenced_sources:
-                                    yield f"data: {{\"sources\": {json.dumps(referenced_sources)}}}\n\n"
+                                    yield sse_event({"sources": referenced_sources})
                                     print(f"📋 Returning {len(referenced_sources)} referenced sources out of {len(sources)} total sources")
                                 elif sources:
                                     print(f"⚠️ AI did not reference any specific files, returning all sources")
-                                    yield f"data: {{\"sources\": {json.dumps(sources)}}}\n\n"
+                                    yield sse_event({"sources": sources})
                                 
                                 # Send done signal and break
-                                yield f"data: {{\"done\": true}}\n\n"
+                                yield SSE_DONE_EVENT
                                 break
                                 
                         except json.JSONDecodeError:
                             # Skip invalid JSON lines
                             continue
                             
+                # Send anything still buffered if the stream ended without a done line
+                batch = batcher.flush()
+                if batch:
+                    yield sse_event({"response": batch})
                 # Ensure we send a final done signal if we didn't already
                 if response_count == 0:
                     print("⚠️ No response chunks received from Ollama")
                     # Send sources even if no response chunks
                     if sources:
-                        yield f"data: {{\"sources\": {json.dumps(sources)}}}\n\n"
-                yield f"data: {{\"done\": true}}\n\n"
+                        yield sse_event({"sources": sources})
+                yield SSE_DONE_EVENT
             else:
-                yield f"data: {{\"error\": \"Failed to get response from model\"}}\n\n"
+                yield sse_event({"error": "Failed to get response from model"})
                 
         except Exception as e:
             print(f"❌ Streaming error: {e}")
-            yield f"data: {{\"error\": \"{str(e)}\"}}\n\n"
+            yield sse_event({"error": str(e)})
     
     # Return proper Server-Sent Events response
     return Response(
         generate(), 
         mimetype='text/event-stream',
         headers={
-            'Cache-Control': 'no-cache',
-            'Connection': 'keep-alive',
+            **SSE_HEADERS,
             'Access-Control-Allow-Origin': '*',
             'Access-Control-Allow-Headers': 'Cache-Control'
         }
@@ -2100,7 +2741,6 @@ def convert_docx_to_markdown():
                 )
             else:
                 # Multiple files - create zip
-                import zipfile
                 zip_path = os.path.join(temp_dir, 'converted_files.zip')
                 
                 with zipfile.ZipFile(zip_path, 'w', zipfile.ZIP_DEFLATED) as zipf:
@@ -2207,7 +2847,6 @@ def find_latest_file():
             return jsonify({'error': f'Directory not found: {directory}'}), 404
         
         # Find all files matching pattern
-        import glob
         search_pattern = os.path.join(target_path, "**", pattern)
         matching_files = glob.glob(search_pattern, recursive=True)
         
@@ -2315,8 +2954,7 @@ def grep_content():
                     relative_path = os.path.relpath(file_path, kb_path)
                     
                     try:
-                        with open(file_path, 'r', encoding='utf-8') as f:
-                            content = f.read()
+                        content = read_markdown_file(file_path)
                         
                         # Search in content
                         content_to_search = content if case_sensitive else content.lower()
@@ -2390,8 +3028,7 @@ def get_file_content():
         file_info = format_file_info(file_path, relative_path)
         
         # Read file content
-        with open(file_path, 'r', encoding='utf-8') as f:
-            content = f.read()
+        content = read_markdown_file(file_path)
         
         return jsonify({
             'success': True,
@@ -2634,7 +3271,6 @@ def convert_audio_to_text():
                 )
             else:
                 # Multiple files - create zip
-                import zipfile
                 zip_path = os.path.join(temp_dir, 'transcribed_files.zip')
                 
                 with zipfile.ZipFile(zip_path, 'w', zipfile.ZIP_DEFLATED) as zipf:
@@ -2657,7 +3293,6 @@ def convert_audio_to_text():
 
 
 if __name__ == "__main__":
-    # Initialize knowledge base at startup
-    reload_knowledge_base()
+    # Knowledge base is already loaded at import; reload explicitly via /knowledge-base/reload
     print(f"Starting server... Knowledge base loaded with {len(kb)} documents.")
     app.run(host='0.0.0.0', port=5557)
\ No newline at end of file
@@ -0,0 +1,142 @@
+"""
+Tests for loading markdown files and the parsed knowledge base cache
+Unchanged files are reused from the cache, changed (mtime or size) files are read again
+"""
+
+import os
+
+import pytest
+
+
+@pytest.fixture
+def kb(server, tmp_path, monkeypatch):
+    """A knowledge base folder with its own cache file, counting which files get read"""
+    folder = tmp_path / "knowledge_base"
+    (folder / "QA").mkdir(parents=True)
+    (folder / "License Dates.md").write_text("# Licenses\nRenew on the first of May\n", encoding="utf-8")
+    (folder / "QA" / "setup.md").write_text("# Setup\nRun the server\n## Tests\nRun pytest\n", encoding="utf-8")
+
+    monkeypatch.setattr(server, "KB_CACHE_FILE", str(tmp_path / "knowledge_base_cache.pkl"))
+    monkeypatch.setattr(server, "KB_CACHE", None)
+
+    read_paths = []
+    read_markdown_file = server.read_markdown_file
+
+    def counting_read(file_path):
+        read_paths.append(os.path.relpath(file_path, folder))
+        return read_markdown_file(file_path)
+
+    monkeypatch.setattr(server, "read_markdown_file", counting_read)
+    return folder, read_paths
+
+
+def load(server, folder):
+    return {doc['filename']: doc for doc in server.load_knowledge_base(str(folder))}
+
+
+def test_loads_nested_files(server, kb):
+    folder, read_paths = kb
+    docs = load(server, folder)
+    assert sorted(docs) == ["License Dates.md", os.path.join("QA", "setup.md")]
+    setup = docs[os.path.join("QA", "setup.md")]
+    assert [section['header'] for section in setup['sections']] == ["# Setup", "## Tests"]
+    assert sorted(read_paths) == sorted(docs)
+
+
+def test_unchanged_files_come_from_cache(server, kb):
+    folder, read_paths = kb
+    first = load(server, folder)
+    read_paths.clear()
+
+    assert load(server, folder) == first
+    assert read_paths == []
+
+
+def test_cache_survives_restart(server, kb, monkeypatch):
+    folder, read_paths = kb
+    first = load(server, folder)
+    read_paths.clear()
+
+    monkeypatch.setattr(server, "KB_CACHE", None)  # A new process only has the pickle
+    assert load(server, folder) == first
+    assert read_paths == []
+
+
+def test_changed_size_is_reread(server, kb):
+    folder, read_paths = kb
+    load(server, folder)
+    read_paths.clear()
+
+    path = folder / "License Dates.md"
+    stat = path.stat()
+    path.write_text("# Licenses\nRenew on the first of June, every year\n", encoding="utf-8")
+    os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns))  # Same mtime, only the size differs
+
+    docs = load(server, folder)
+    assert read_paths == ["License Dates.md"]
+    assert "June" in docs["License Dates.md"]['content']
+
+
+def test_changed_mtime_is_reread(server, kb):
+    folder, read_paths = kb
+    load(server, folder)
+    read_paths.clear()
+
+    path = folder / "License Dates.md"
+    stat = path.stat()
+    path.write_text("# Licenses\nRenew on the first of JUNE\n", encoding="utf-8")  # Same size as before
+    os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000_000))
+
+    docs = load(server, folder)
+    assert read_paths == ["License Dates.md"]
+    assert "JUNE" in docs["License Dates.md"]['content']
+
+
+def test_deleted_and_added_files(server, kb):
+    folder, read_paths = kb
+    load(server, folder)
+    read_paths.clear()
+
+    os.remove(folder / "License Dates.md")
+    (folder / "QA" / "release.md").write_text("# Release\nTag the build\n", encoding="utf-8")
+
+    docs = load(server, folder)
+    assert sorted(docs) == [os.path.join("QA", "release.md"), os.path.join("QA", "setup.md")]
+    assert read_paths == [os.path.join("QA", "release.md")]
+    assert str(folder / "License Dates.md") not in server.KB_CACHE['files']
+
+
+def test_empty_file(server, kb):
+    folder, _ = kb
+    (folder / "empty.md").write_bytes(b"")
+
+    assert server.read_markdown_file(str(folder / "empty.md")) == ""
+    docs = load(server, folder)
+    assert docs["empty.md"]['content'] == ""
+    assert docs["empty.md"]['sections'] == []
+
+
+def test_windows_line_endings(server, kb):
+    folder, _ = kb
+    (folder / "crlf.md").write_bytes(b"# Title\r\nline one\r\nline two\r")
+
+    assert server.read_markdown_file(str(folder / "crlf.md")) == "# Title\nline one\nline two\n"
+
+
+def test_non_utf8_file_is_skipped(server, kb):
+    folder, read_paths = kb
+    (folder / "latin1.md").write_bytes("# Café\nnaïve\n".encode("latin-1"))
+
+    with pytest.raises(UnicodeDecodeError):
+        server.read_markdown_file(str(folder / "latin1.md"))
+
+    docs = load(server, folder)
+    assert "latin1.md" not in docs
+    assert str(folder / "latin1.md") not in server.KB_CACHE['files']
+
+    # Once fixed it is picked up rather than served as a cached empty document
+    (folder / "latin1.md").write_text("# Café\nnaïve\n", encoding="utf-8")
+    read_paths.clear()
+    docs = load(server, folder)
+    assert docs["latin1.md"]['content'] == "# Café\nnaïve\n"
+    assert read_paths == ["latin1.md"]
@@ -0,0 +1,134 @@
+"""
+Tests for the keyword search over the knowledge base
+The indexed search must rank exactly like the original per-section loop kept below
+"""
+
+import random
+import threading
+
+
+def reference_search(query, knowledge_base, num_results=5):
+    """The original search_knowledge_base loop, before the inverted index"""
+    query_lower = query.lower()
+    query_words = set(query_lower.split())
+    results = []
+
+    for doc in knowledge_base:
+        filename_parts = doc['filename'].split('/')
+        folder_path = '/'.join(filename_parts[:-1]) if len(filename_parts) > 1 else 'root'
+        filename_lower = filename_parts[-1].lower()
+        folder_lower = folder_path.lower()
+
+        filename_match_score = 0
+        if any(word in filename_lower for word in query_words):
+            filename_match_score = 15
+        if any(word in folder_lower for word in query_words):
+            filename_match_score = 12
+        if query_lower in folder_lower or folder_lower in query_lower:
+            filename_match_score += 10
+
+        for section in doc['sections']:
+            content = section['content']
+            if not content.strip():
+                continue
+            section_text = (section['header'] + ' ' + content).lower()
+            score = len(query_words & set(section_text.split()))
+            if any(word in section['header'].lower() for word in query_words):
+                score += 5
+            score += min(len(content.split()) / 100, 3)
+            score += filename_match_score
+            if score > 0:
+                results.append({
+                    "score": score,
+                    "section": content.strip(),
+                    "header": section['header'],
+                    "filename": doc['filename'],
+                    "folder_path": folder_path,
+                    "relevance": round((score / (len(query_words) + 2)) * 100, 2)
+                })
+
+    results.sort(key=lambda x: x['score'], reverse=True)
+    return results[:num_results]
+
+
+VOCAB = ['license', 'date', 'qa', 'setup', 'run', 'server', 'the', 'a', 'python', 'flask',
+         'expire', 'when', 'Foo', 'bar', 'baz', 'QA/setup', 'x']
+
+
+def random_knowledge_base(server, rng, num_docs=60):
+    """Documents with repeated words, empty sections and long sections across a few folders"""
+    knowledge_base = []
+    for doc_id in range(num_docs):
+        folder = rng.choice(['', 'QA/', 'docs/', 'docs/license/', 'Notes/'])
+        lines = []
+        for _ in range(rng.randint(1, 6)):
+            lines.append('#' * rng.randint(1, 3) + ' ' + ' '.join(rng.choices(VOCAB, k=rng.randint(0, 3))))
+            lines.append(' '.join(rng.choices(VOCAB, k=rng.choice([0, 3, 50, 350]))))
+        content = '\n'.join(lines)
+        knowledge_base.append({
+            'filename': f"{folder}{rng.choice(VOCAB)}{doc_id}.md",
+            'content': content,
+            'sections': server.split_into_sections(content)
+        })
+    return knowledge_base
+
+
+def test_ranking_matches_reference(server):
+    rng = random.Random(1)
+    knowledge_base = random_knowledge_base(server, rng)
+    for _ in range(300):
+        query = ' '.join(rng.choices(VOCAB + ['zzz', 'QA', 'License Dates'], k=rng.randint(0, 4)))
+        num_results = rng.choice([1, 3, 5, 50])
+        assert server.search_knowledge_base(query, knowledge_base, num_results) == \
+            reference_search(query, knowledge_base, num_results), query
+
+
+def test_repeated_query_returns_a_copy(server):
+    knowledge_base = random_knowledge_base(server, random.Random(2), num_docs=10)
+    first = server.search_knowledge_base("license date", knowledge_base)
+    first.clear()
+    assert server.search_knowledge_base("license date", knowledge_base) == \
+        reference_search("license date", knowledge_base)
+
+
+def test_reloaded_knowledge_base_is_reindexed(server):
+    knowledge_base = random_knowledge_base(server, random.Random(3), num_docs=10)
+    before = server.search_knowledge_base("zebra", knowledge_base)
+    assert all(result['filename'] != 'animals/zebra.md' for result in before)
+
+    content = "# Zebra\nzebra crossing notes"
+    reloaded = knowledge_base + [{
+        'filename': 'animals/zebra.md',
+        'content': content,
+        'sections': server.split_into_sections(content)
+    }]
+    results = server.search_knowledge_base("zebra", reloaded)
+    assert results and results[0]['filename'] == 'animals/zebra.md'
+    assert results == reference_search("zebra", reloaded)
+
+
+def test_empty_knowledge_base(server):
+    assert server.search_knowledge_base("license", []) == []
+
+
+def test_concurrent_searches_across_reloads(server):
+    rng = random.Random(4)
+    knowledge_bases = [random_knowledge_base(server, rng, num_docs=15) for _ in range(3)]
+    expected = [reference_search("license setup", kb) for kb in knowledge_bases]
+    errors = []
+
+    def worker(offset):
+        for i in range(60):
+            which = (i + offset) % len(knowledge_bases)
+            try:
+                if server.search_knowledge_base("license setup", knowledge_bases[which]) != expected[which]:
+                    errors.append(which)
+            except Exception as e:
+                errors.append(e)
+
+    threads = [threading.Thread(target=worker, args=(offset,)) for offset in range(6)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert errors == []
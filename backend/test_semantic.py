@@ -0,0 +1,100 @@
+"""
+Tests for the opt-in semantic answer cache and semantic section search
+A bag-of-words fake stands in for sentence_transformers (see conftest.py)
+"""
+
+import sys
+
+import pytest
+
+pytest.importorskip("faiss")
+
+from semantic_cache import SemanticCache
+from semantic_search import SemanticSearch
+
+
+def test_cache_hit_for_same_question_in_scope(fake_sentence_transformers):
+    cache = SemanticCache()
+    entry, embedding = cache.lookup("when does the license expire", scope="kb")
+    assert entry is None
+    cache.store(embedding, "when does the license expire", "In May", scope="kb")
+
+    entry, _ = cache.lookup("When does the license expire", scope="kb")
+    assert entry['response'] == "In May"
+    assert cache.lookup("when does the license expire", scope="other")[0] is None
+    assert cache.lookup("how do I run the server", scope="kb")[0] is None
+    assert cache.get_stats()['hits'] == 1
+
+
+def test_cache_entries_expire(fake_sentence_transformers, monkeypatch):
+    cache = SemanticCache(ttl=10)
+    _, embedding = cache.lookup("license")
+    cache.store(embedding, "license", "answer")
+
+    import semantic_cache
+    now = semantic_cache.time.time()
+    monkeypatch.setattr(semantic_cache.time, "time", lambda: now + 11)
+    assert cache.lookup("license")[0] is None
+    assert cache.get_stats()['size'] == 0
+
+
+def test_cache_evicts_least_recently_used(fake_sentence_transformers):
+    cache = SemanticCache(max_entries=2)
+    for question in ["alpha", "beta", "gamma"]:
+        _, embedding = cache.lookup(question)
+        cache.store(embedding, question, question.upper())
+
+    assert cache.lookup("alpha")[0] is None
+    assert cache.lookup("gamma")[0]['response'] == "GAMMA"
+
+
+def test_cache_is_a_noop_when_model_fails_to_load(monkeypatch):
+    attempts = []
+
+    class BrokenModel:
+        def __init__(self, model_name):
+            attempts.append(model_name)
+            raise OSError("model download failed")
+
+    module = type(sys)("sentence_transformers")
+    module.SentenceTransformer = BrokenModel
+    monkeypatch.setitem(sys.modules, "sentence_transformers", module)
+
+    cache = SemanticCache()
+    assert cache.lookup("license") == (None, None)
+    cache.store(None, "license", "answer")
+    assert cache.lookup("license") == (None, None)
+    assert len(attempts) == 1
+    assert cache.get_stats()['load_failed'] is True
+
+
+def test_search_ranks_matching_section_first(fake_sentence_transformers, tmp_path):
+    search = SemanticSearch(cache_file=str(tmp_path / "section_embeddings.npy"))
+    search.build(["renew the license in may", "run the server with flask", "qa setup checklist"])
+
+    scores, ids = search.search("flask server", 2)
+    assert ids[0] == 1
+    assert scores[0] >= scores[1]
+
+
+def test_search_reuses_saved_embeddings(fake_sentence_transformers, tmp_path):
+    texts = ["renew the license in may", "run the server with flask"]
+    first = SemanticSearch(cache_file=str(tmp_path / "section_embeddings.npy"))
+    first.build(texts)
+    assert first.model.encoded == len(texts)
+
+    # A restarted server loads the saved index instead of embedding every section again
+    second = SemanticSearch(cache_file=str(tmp_path / "section_embeddings.npy"))
+    second.build(texts)
+    assert second.model is None
+    assert second.index.ntotal == len(texts)
+
+    # Changed sections invalidate the saved files
+    second.build(texts + ["qa setup checklist"])
+    assert second.model.encoded == 3
+
+
+def test_search_without_index(tmp_path):
+    search = SemanticSearch(cache_file=str(tmp_path / "section_embeddings.npy"))
+    scores, ids = search.search("anything", 5)
+    assert len(scores) == len(ids) == 0
@@ -0,0 +1,81 @@
+"""
+Tests for TokenBatcher, which joins streamed Ollama tokens into fewer SSE events
+"""
+
+import pytest
+
+
+@pytest.fixture
+def clock(server, monkeypatch):
+    """Control the monotonic clock the batcher reads"""
+    now = [100.0]
+    monkeypatch.setattr(server.time, "monotonic", lambda: now[0])
+    return now
+
+
+def test_first_token_is_sent_immediately(server, clock):
+    batcher = server.TokenBatcher(max_chars=32, max_delay=0.02)
+    assert batcher.add("Hello") == "Hello"
+
+
+def test_tokens_are_joined_until_max_chars(server, clock):
+    batcher = server.TokenBatcher(max_chars=10, max_delay=0.02)
+    batcher.add("first")
+    assert batcher.add("abcd") is None
+    assert batcher.add("efgh") is None
+    assert batcher.add("ij") == "abcdefghij"
+    assert batcher.flush() is None
+
+
+def test_poll_releases_tokens_after_max_delay(server, clock):
+    batcher = server.TokenBatcher(max_chars=32, max_delay=0.02)
+    batcher.add("first")
+    assert batcher.add(" second") is None
+
+    clock[0] += 0.01
+    assert batcher.poll() is None
+    clock[0] += 0.015
+    assert batcher.poll() == " second"
+    assert batcher.poll() is None
+
+
+def test_deadline_counts_from_oldest_token(server, clock):
+    batcher = server.TokenBatcher(max_chars=32, max_delay=0.02)
+    batcher.add("first")
+    batcher.add(" a")
+    clock[0] += 0.015
+    assert batcher.add(" b") is None
+    clock[0] += 0.01
+    assert batcher.add(" c") == " a b c"
+
+
+def test_flush_drains_the_buffer(server, clock):
+    batcher = server.TokenBatcher(max_chars=32, max_delay=0.02)
+    assert batcher.flush() is None
+    # After a flush the first token is no longer special
+    assert batcher.add("one") is None
+    assert batcher.add(" two") is None
+    assert batcher.flush() == "one two"
+    assert batcher.flush() is None
+
+
+def test_batches_preserve_the_stream(server, clock):
+    batcher = server.TokenBatcher(max_chars=8, max_delay=0.02)
+    tokens = [f"t{i} " for i in range(40)]
+    sent = []
+    for i, token in enumerate(tokens):
+        clock[0] += 0.003 * (i % 4)
+        text = batcher.add(token)
+        if text:
+            sent.append(text)
+    tail = batcher.flush()
+    if tail:
+        sent.append(tail)
+    assert "".join(sent) == "".join(tokens)
+    assert len(sent) < len(tokens)
+
+
+def test_trainer_uses_the_server_batcher(server):
+    if not server.OLLAMA_TRAINER_IMPORTED:
+        pytest.skip("ollama_trainer not available")
+    assert server.get_ollama_trainer().token_batcher is server.TokenBatcher